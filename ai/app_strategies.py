@@ -0,0 +1,146 @@
+"""Хранилище стратегий приложений: отдельный файл на приложение, загрузка по требованию, LRU."""
+import json
+import os
+import re
+from collections import OrderedDict
+from typing import Dict
+
+APPS_DIR = "apps"
+LEGACY_FILE = "app_strategies.json"
+
+
+def normalize_app_title(title: str) -> str:
+    """Приведение вариантов заголовка окна одной игры к одному ключу.
+
+    "Durak Online - Стол #1532 (2 игрока)" и "DURAK ONLINE - стол #77"
+    дают одно и то же "durak online стол".
+    """
+    text = title.lower()
+    text = re.sub(r"[(\[{].*?[)\]}]", " ", text)
+    text = re.sub(r"[\d#№_]+", " ", text)
+    text = re.sub(r"[^\w]+", " ", text)
+    return " ".join(text.split())
+
+
+def new_app_stats() -> Dict:
+    return {
+        "preferred_moves": {},
+        "success_rate": 0.0,
+        "games_played": 0,
+        "typical_patterns": []
+    }
+
+
+def sum_app_stats(a: Dict, b: Dict) -> Dict:
+    """Сумма статистики двух заголовков одного приложения.
+
+    Счетчики ходов и партий складываются, доля побед - средняя с весом по
+    числу партий; паттерны берутся у записи с большим числом партий.
+    """
+    moves = {key: dict(move) for key, move in a.get("preferred_moves", {}).items()}
+    for key, move in b.get("preferred_moves", {}).items():
+        total = moves.setdefault(key, {"count": 0, "success": 0.0})
+        total["count"] += move["count"]
+        total["success"] += move["success"]
+
+    games_a, games_b = a.get("games_played", 0), b.get("games_played", 0)
+    games = games_a + games_b
+    merged = dict(a if games_a >= games_b else b)
+    merged["preferred_moves"] = moves
+    merged["games_played"] = games
+    if games:
+        merged["success_rate"] = (
+            a.get("success_rate", 0.0) * games_a + b.get("success_rate", 0.0) * games_b
+        ) / games
+    return merged
+
+
+class AppStrategyStore:
+    """Статистика приложений в ai_data/apps/<ключ>.json.
+
+    В памяти держится не больше capacity приложений; при вытеснении
+    измененная статистика записывается на диск.
+    """
+
+    def __init__(self, save_dir: str, capacity: int = 8):
+        self.save_dir = save_dir
+        self.apps_dir = os.path.join(save_dir, APPS_DIR)
+        self.capacity = capacity
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._dirty = set()
+        self._legacy_checked = False
+
+    def _path(self, app: str) -> str:
+        name = re.sub(r"\W+", "_", app).strip("_") or "unknown"
+        return os.path.join(self.apps_dir, f"{name}.json")
+
+    def get(self, app: str) -> Dict:
+        """Статистика приложения (загружается с диска при первом обращении)"""
+        stats = self._cache.get(app)
+        if stats is not None:
+            self._cache.move_to_end(app)
+            return stats
+
+        self._migrate_legacy()
+        try:
+            with open(self._path(app), "r", encoding="utf-8") as f:
+                stats = json.load(f)
+        except FileNotFoundError:
+            stats = new_app_stats()
+        self._cache[app] = stats
+        self._evict()
+        return stats
+
+    def put(self, app: str, stats: Dict):
+        self._cache[app] = stats
+        self._cache.move_to_end(app)
+        self._dirty.add(app)
+        self._evict()
+
+    def mark_dirty(self, app: str):
+        self._dirty.add(app)
+
+    def __contains__(self, app: str) -> bool:
+        return app in self._cache
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def flush(self):
+        """Запись всех измененных приложений"""
+        for app in list(self._dirty):
+            if app in self._cache:
+                self._write(app, self._cache[app])
+        self._dirty.clear()
+
+    def _evict(self):
+        while len(self._cache) > self.capacity:
+            app, stats = self._cache.popitem(last=False)
+            if app in self._dirty:
+                self._write(app, stats)
+                self._dirty.discard(app)
+
+    def _write(self, app: str, stats: Dict):
+        os.makedirs(self.apps_dir, exist_ok=True)
+        with open(self._path(app), "w", encoding="utf-8") as f:
+            json.dump(stats, f, ensure_ascii=False)
+
+    def _migrate_legacy(self):
+        """Однократный перенос общего app_strategies.json в отдельные файлы"""
+        if self._legacy_checked:
+            return
+        self._legacy_checked = True
+        legacy_path = os.path.join(self.save_dir, LEGACY_FILE)
+        if not os.path.exists(legacy_path):
+            return
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            legacy = json.load(f)
+        # Разные заголовки одной игры дают один ключ - их статистика суммируется
+        merged: Dict[str, Dict] = {}
+        for title, stats in legacy.items():
+            app = normalize_app_title(title)
+            merged[app] = sum_app_stats(merged[app], stats) if app in merged else stats
+        for app, stats in merged.items():
+            if not os.path.exists(self._path(app)):
+                self._write(app, stats)
+        os.replace(legacy_path, legacy_path + ".migrated")
@@ -1,10 +1,16 @@
-from typing import List, Optional, Tuple
+from typing import List, Optional, Tuple, Union
 from game.durak_game import Card
-from .learning_engine import LearningEngine, GameState, GameAction, GameResult
+from perf.metrics import metrics
+from .learning_engine import LearningEngine, LearningSession, GameState, GameAction, GameResult
 import random
 
+# Предел кэша решений; при переполнении кэш очищается целиком
+DECISION_CACHE_SIZE = 1024
+# Вес поправки стиля (режим и корректировки приложения) к оценкам модели ценности
+MODEL_STYLE_WEIGHT = 0.05
+
 class DurakAI:
-    def __init__(self):
+    def __init__(self, learning_engine: Union[LearningEngine, LearningSession, None] = None):
         self.hand: List[Card] = []
         self.known_cards: List[Card] = []
         self.trump_suit: Optional[str] = None
@@ -14,10 +20,20 @@ class DurakAI:
         self.auto_play = False  # Режим автоматической игры
         
         # Добавляем систему обучения
-        self.learning_engine = LearningEngine()
+        # Несколько столов передают сюда LearningEngine.session() общего движка
+        self.learning_engine = learning_engine or LearningEngine()
         self.current_game_moves = 0
         self.last_state = None
         self.last_action = None
+        
+        # Обученная модель ценности ходов (ai/trainer.py --value-model), иначе эвристика.
+        # Загружается при первом решении, чтобы не тянуть NumPy при старте
+        self._value_model = None
+        self._value_model_loaded = False
+        
+        # Решения по одинаковым позициям: анализ идет много раз в секунду, а стол меняется редко.
+        # В ключе - версия обучения: record_move и learn_from_game меняют корректировки и веса
+        self._decision_cache = {}
     
     def update_game_state(self, hand: List[Card], trump_suit: str, 
                          opponent_cards: int = 0, deck_remaining: int = 0,
@@ -30,17 +46,37 @@ class DurakAI:
         if window_title:
             self.learning_engine.detect_current_app(window_title)
     
+    @property
+    def value_model(self):
+        if not self._value_model_loaded:
+            from .value_model import VALUE_MODEL_FILE, load_value_model
+            self._value_model = load_value_model(
+                f"{self.learning_engine.save_dir}/{VALUE_MODEL_FILE}"
+            )
+            self._value_model_loaded = True
+        return self._value_model
+    
+    @value_model.setter
+    def value_model(self, model):
+        self._value_model = model
+        self._value_model_loaded = True
+        self._decision_cache.clear()
+    
     def set_auto_play(self, enabled: bool):
         """Включение/выключение режима автоматической игры"""
         self.auto_play = enabled
     
     def get_auto_play_action(self, table_cards: List[Card]) -> Tuple[str, Optional[Card]]:
+        with metrics.timer("ai.decision"):
+            return self._get_auto_play_action(table_cards)
+    
+    def _get_auto_play_action(self, table_cards: List[Card]) -> Tuple[str, Optional[Card]]:
         self.current_game_moves += 1
         
         # Создаем текущее состояние игры
         current_state = GameState(
-            self.hand.copy(),
-            table_cards.copy(),
+            self.hand,
+            table_cards,
             self.trump_suit,
             self.opponent_cards_count,
             self.deck_remaining
@@ -52,7 +88,7 @@ class DurakAI:
             self.learning_engine.record_move(self.last_state, self.last_action, result_score)
         
         # Определяем действие
-        action_type, card = self._choose_action(table_cards)
+        action_type, card = self.recommend(table_cards, current_state)
         
         # Сохраняем состояние и действие
         self.last_state = current_state
@@ -60,6 +96,45 @@ class DurakAI:
         
         return action_type, card
     
+    def decide_frame(self, table_cards: List[Card]) -> Tuple[str, Optional[Card], bool]:
+        """Ход для очередного кадра анализа.
+
+        Одна и та же позиция видна на многих кадрах подряд: в историю
+        обучения ход записывается только при новой позиции, иначе - только
+        recommend. Третий элемент - True, если позиция новая.
+        """
+        state = GameState(self.hand, table_cards, self.trump_suit,
+                          self.opponent_cards_count, self.deck_remaining)
+        if state == self.last_state:
+            action_type, card = self.recommend(table_cards, state)
+            return action_type, card, False
+        action_type, card = self.get_auto_play_action(table_cards)
+        return action_type, card, True
+    
+    def recommend(self, table_cards: List[Card],
+                  state: Optional[GameState] = None) -> Tuple[str, Optional[Card]]:
+        """Выбор хода без записи в историю обучения"""
+        if state is None:
+            state = GameState(self.hand, table_cards, self.trump_suit,
+                              self.opponent_cards_count, self.deck_remaining)
+        engine = self.learning_engine
+        key = (state, self.aggressive_mode, engine.current_app, engine.version)
+        decision = self._decision_cache.get(key)
+        if decision is not None:
+            metrics.incr("ai.decision_cache_hit")
+            return decision
+        metrics.incr("ai.decision_cache_miss")
+        
+        if self.value_model:
+            decision = self._choose_action_by_model(state)
+        else:
+            decision = self._choose_action(table_cards)
+        
+        if len(self._decision_cache) >= DECISION_CACHE_SIZE:
+            self._decision_cache.clear()
+        self._decision_cache[key] = decision
+        return decision
+    
     def _choose_action(self, table_cards: List[Card]) -> Tuple[str, Optional[Card]]:
         if not table_cards:
             card = self._choose_attack_card()
@@ -75,6 +150,39 @@ class DurakAI:
                 return "add", card
             return "done", None
     
+    def get_legal_actions(self, table_cards: List[Card]) -> List[GameAction]:
+        """Все допустимые ходы в текущей позиции"""
+        if not table_cards:
+            return [GameAction("attack", card) for card in self.hand] or [GameAction("attack")]
+        if len(table_cards) % 2 == 1:
+            attacking_card = table_cards[-1]
+            actions = [
+                GameAction("defend", card) for card in self.hand
+                if card.can_beat(attacking_card, self.trump_suit)
+            ]
+            actions.append(GameAction("take"))
+            return actions
+        table_ranks = {card.rank for card in table_cards}
+        actions = [GameAction("add", card) for card in self.hand if card.rank in table_ranks]
+        actions.append(GameAction("done"))
+        return actions
+    
+    def _choose_action_by_model(self, state: GameState) -> Tuple[str, Optional[Card]]:
+        """Выбор хода с лучшей оценкой модели, все кандидаты оцениваются одним пакетом.
+
+        К оценке добавляется поправка стиля: агрессивный режим и
+        корректировки стратегии приложения действуют и при обученной модели.
+        """
+        from .value_model import extract_batch, style_bonus
+        actions = self.get_legal_actions(state.table)
+        features = extract_batch(state, actions)
+        adjustments = self.learning_engine.get_strategy_adjustments()
+        scores = self.value_model.predict(features) + MODEL_STYLE_WEIGHT * style_bonus(
+            features, self.aggressive_mode, adjustments
+        )
+        best = actions[int(scores.argmax())]
+        return best.type, best.card
+    
     def _evaluate_move_result(self, current_state: GameState) -> float:
         """Оценка результата предыдущего хода"""
         score = 0.0
@@ -108,6 +216,7 @@ class DurakAI:
         self.learning_engine.learn_from_game(GameResult(won, self.current_game_moves))
         
         # Сбрасываем счетчики
+        self._decision_cache.clear()
         self.current_game_moves = 0
         self.last_state = None
         self.last_action = None
@@ -1,125 +1,286 @@
+import heapq
 import json
-import numpy as np
-from typing import List, Dict, Tuple
+import struct
+import threading
+from typing import Iterable, List, Dict, Optional, Tuple
 from datetime import datetime
-from game.durak_game import Card
+from game.durak_game import Card, cards_to_mask, mask_to_cards
+from .app_strategies import AppStrategyStore, normalize_app_title
+from .params import load_params
+from .pattern_miner import PatternMiner
 import os
 
-class GameState:
-    def __init__(self, hand: List[Card], table: List[Card], trump_suit: str,
+HISTORY_FILE = "history.jsonl"
+TYPICAL_PATTERNS_COUNT = 10
+# Отсутствующая карта/масть в бинарном формате
+NO_CARD = 255
+
+class _Record:
+    """Неизменяемая запись с __slots__: сравнение и хеш по упакованным полям,
+    бинарная сериализация через to_bytes/from_bytes (ею же пользуется pickle)"""
+    __slots__ = ("_key",)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} неизменяем")
+    
+    def __eq__(self, other):
+        return type(other) is type(self) and other._key == self._key
+    
+    def __hash__(self):
+        return hash(self._key)
+    
+    def __reduce__(self):
+        return type(self).from_bytes, (self.to_bytes(),)
+    
+    def _set(self, **fields):
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+def _suit_code(suit: str) -> int:
+    return Card.SUITS.index(suit) if suit in Card.SUITS else NO_CARD
+
+class GameState(_Record):
+    __slots__ = ("hand_mask", "table_indices", "trump_suit", "opponent_cards", "deck_remaining")
+    
+    # маска руки, козырь, карты противника, колода, число карт на столе
+    _HEADER = struct.Struct("<QBBBB")
+    
+    def __init__(self, hand: Iterable[Card], table: Iterable[Card], trump_suit: str,
                  opponent_cards: int, deck_remaining: int):
-        self.hand = hand
-        self.table = table
-        self.trump_suit = trump_suit
-        self.opponent_cards = opponent_cards
-        self.deck_remaining = deck_remaining
+        hand_mask = cards_to_mask(hand)
+        table_indices = tuple(card.index for card in table)
+        self._set(
+            hand_mask=hand_mask,
+            table_indices=table_indices,
+            trump_suit=trump_suit,
+            opponent_cards=opponent_cards,
+            deck_remaining=deck_remaining,
+            _key=(hand_mask, table_indices, trump_suit, opponent_cards, deck_remaining)
+        )
+    
+    @property
+    def hand(self) -> Tuple[Card, ...]:
+        return tuple(mask_to_cards(self.hand_mask))
+    
+    @property
+    def hand_size(self) -> int:
+        return bin(self.hand_mask).count("1")
+    
+    @property
+    def table(self) -> Tuple[Card, ...]:
+        # Порядок важен: последняя карта при нечетном числе - атакующая
+        return tuple(Card.from_index(i) for i in self.table_indices)
+    
+    def to_bytes(self) -> bytes:
+        header = self._HEADER.pack(
+            self.hand_mask, _suit_code(self.trump_suit),
+            min(self.opponent_cards, 255), min(self.deck_remaining, 255),
+            len(self.table_indices)
+        )
+        return header + bytes(self.table_indices)
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'GameState':
+        hand_mask, trump, opponent_cards, deck_remaining, table_len = cls._HEADER.unpack_from(data)
+        table = data[cls._HEADER.size:cls._HEADER.size + table_len]
+        return cls(
+            mask_to_cards(hand_mask),
+            [Card.from_index(i) for i in table],
+            Card.SUITS[trump] if trump != NO_CARD else None,
+            opponent_cards,
+            deck_remaining
+        )
+    
+    def to_dict(self) -> Dict:
+        return {
+            "hand": [str(c) for c in self.hand],
+            "table": [str(c) for c in self.table],
+            "trump": self.trump_suit,
+            "opponent_cards": self.opponent_cards,
+            "deck_remaining": self.deck_remaining
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'GameState':
+        return cls(
+            [Card.from_str(c) for c in data["hand"]],
+            [Card.from_str(c) for c in data["table"]],
+            data["trump"],
+            data["opponent_cards"],
+            data["deck_remaining"]
+        )
 
-class GameAction:
+class GameAction(_Record):
+    __slots__ = ("type", "card_index")
+    
+    TYPES = ["attack", "defend", "take", "done", "add"]
+    _FORMAT = struct.Struct("<BB")
+    
     def __init__(self, action_type: str, card: Card = None):
-        self.type = action_type  # attack, defend, take, done, add
-        self.card = card
+        card_index = card.index if card else NO_CARD
+        self._set(type=action_type, card_index=card_index, _key=(action_type, card_index))
+    
+    @property
+    def card(self) -> Optional[Card]:
+        return Card.from_index(self.card_index) if self.card_index != NO_CARD else None
+    
+    def to_bytes(self) -> bytes:
+        return self._FORMAT.pack(self.TYPES.index(self.type), self.card_index)
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'GameAction':
+        action_type, card_index = cls._FORMAT.unpack_from(data)
+        card = Card.from_index(card_index) if card_index != NO_CARD else None
+        return cls(cls.TYPES[action_type], card)
+    
+    def to_dict(self) -> Dict:
+        return {"type": self.type, "card": str(self.card) if self.card else None}
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'GameAction':
+        card = Card.from_str(data["card"]) if data["card"] else None
+        return cls(data["type"], card)
 
-class GameResult:
+class GameResult(_Record):
+    __slots__ = ("won", "moves_count")
+    
+    _FORMAT = struct.Struct("<?I")
+    
     def __init__(self, won: bool, moves_count: int):
-        self.won = won
-        self.moves_count = moves_count
+        self._set(won=won, moves_count=moves_count, _key=(won, moves_count))
+    
+    def to_bytes(self) -> bytes:
+        return self._FORMAT.pack(self.won, self.moves_count)
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'GameResult':
+        return cls(*cls._FORMAT.unpack_from(data))
 
 class LearningEngine:
-    def __init__(self, save_dir: str = "ai_data"):
+    def __init__(self, save_dir: str = "ai_data", params: Optional[Dict] = None):
         self.save_dir = save_dir
+        # Параметры обучения (ai/params.py); ai/tuning.py передает сюда кандидатов
+        self.params = params if params is not None else load_params(save_dir)
         self.game_history: List[Tuple[GameState, GameAction, float]] = []
-        self.weights = self._load_weights()
-        self.app_specific_strategies = self._load_app_strategies()
+        # weights.json читается при первом обращении к weights
+        self._weights = None
+        # Стратегии приложений подгружаются по одному при detect_current_app
+        self.app_specific_strategies = AppStrategyStore(save_dir)
         self.current_app = None
+        self._last_window_title = None
         self.games_played = 0
         self.games_won = 0
+        # Общие веса и статистика могут обновляться из нескольких столов (см. session())
+        self.lock = threading.RLock()
+        # Растет при каждом изменении весов и статистики ходов - по нему DurakAI
+        # понимает, что закэшированные решения устарели
+        self.version = 0
         
         if not os.path.exists(save_dir):
             os.makedirs(save_dir)
     
+    @property
+    def weights(self) -> Dict[str, float]:
+        if self._weights is None:
+            self._weights = self._load_weights()
+        return self._weights
+    
+    @weights.setter
+    def weights(self, value: Dict[str, float]):
+        self._weights = value
+        self.version += 1
+    
     def _load_weights(self) -> Dict[str, float]:
         try:
             with open(f"{self.save_dir}/weights.json", "r") as f:
                 return json.load(f)
         except FileNotFoundError:
-            return {
-                "rank_weight": 0.4,
-                "trump_weight": 0.3,
-                "same_rank_weight": 0.1,
-                "opponent_cards_weight": 0.2,
-                "deck_remaining_weight": 0.1,
-                "aggressive_factor": 0.5
-            }
-    
-    def _load_app_strategies(self) -> Dict[str, Dict]:
-        try:
-            with open(f"{self.save_dir}/app_strategies.json", "r") as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {}
+            return dict(self.params["initial_weights"])
     
     def detect_current_app(self, window_title: str):
         """Определение текущего приложения по заголовку окна"""
-        self.current_app = window_title
-        if window_title not in self.app_specific_strategies:
-            self.app_specific_strategies[window_title] = {
-                "preferred_moves": {},
-                "success_rate": 0.0,
-                "games_played": 0,
-                "typical_patterns": []
-            }
+        if window_title == self._last_window_title:
+            return
+        self._last_window_title = window_title
+        self.current_app = normalize_app_title(window_title)
+        with self.lock:
+            self.app_specific_strategies.get(self.current_app)
+    
+    def session(self) -> 'LearningSession':
+        """Отдельная история партии и приложение для стола с общими весами этого движка"""
+        return LearningSession(self)
+    
+    @staticmethod
+    def move_key(action: GameAction) -> str:
+        """Ключ хода в статистике preferred_moves"""
+        return f"{action.type}_{action.card if action.card else 'none'}"
     
     def record_move(self, state: GameState, action: GameAction, result_score: float):
         """Запись хода для обучения"""
         self.game_history.append((state, action, result_score))
-        
-        # Обновляем статистику для конкретного приложения
-        if self.current_app:
-            key = f"{action.type}_{action.card if action.card else 'none'}"
-            stats = self.app_specific_strategies[self.current_app]["preferred_moves"]
+        self._record_app_move(self.current_app, action, result_score)
+    
+    def _record_app_move(self, app: str, action: GameAction, result_score: float):
+        """Обновление статистики ходов для конкретного приложения"""
+        if not app:
+            return
+        with self.lock:
+            key = self.move_key(action)
+            stats = self.app_specific_strategies.get(app)["preferred_moves"]
+            self.app_specific_strategies.mark_dirty(app)
             if key not in stats:
                 stats[key] = {"count": 0, "success": 0.0}
             stats[key]["count"] += 1
             stats[key]["success"] += result_score
+            self.version += 1
     
     def learn_from_game(self, game_result: GameResult):
         """Обучение на основе результатов игры"""
-        self.games_played += 1
-        if game_result.won:
-            self.games_won += 1
-        
-        # Обновляем веса на основе истории игры
-        for state, action, score in self.game_history:
-            self._update_weights(state, action, score, game_result)
-        
-        # Обновляем статистику приложения
-        if self.current_app:
-            app_stats = self.app_specific_strategies[self.current_app]
-            app_stats["games_played"] += 1
-            app_stats["success_rate"] = self.games_won / self.games_played
-            
-            # Анализируем паттерны игры
-            self._analyze_patterns()
-        
-        # Сохраняем обновленные данные
-        self._save_data()
+        self._learn(self.current_app, self.game_history, game_result)
         
         # Очищаем историю текущей игры
         self.game_history.clear()
     
+    def _learn(self, app: str, history: List[Tuple[GameState, GameAction, float]],
+               game_result: GameResult):
+        with self.lock:
+            self.version += 1
+            self.games_played += 1
+            if game_result.won:
+                self.games_won += 1
+            
+            # Обновляем веса на основе истории игры
+            for state, action, score in history:
+                self._update_weights(state, action, score, game_result)
+            
+            # Обновляем статистику приложения
+            if app:
+                app_stats = self.app_specific_strategies.get(app)
+                self.app_specific_strategies.mark_dirty(app)
+                app_stats["games_played"] += 1
+                app_stats["success_rate"] = self.games_won / self.games_played
+                
+                # Анализируем паттерны игры
+                self._analyze_patterns(app, history)
+            
+            # Сохраняем обновленные данные
+            self._save_data()
+            self._append_history(app, history, game_result)
+    
     def _update_weights(self, state: GameState, action: GameAction, score: float, 
                        game_result: GameResult):
         """Обновление весов на основе результата хода"""
-        learning_rate = 0.1
+        params = self.params
+        learning_rate = params["learning_rate"]
         
         # Корректируем веса на основе успешности хода
-        success_factor = 1.0 if game_result.won else -0.5
+        success_factor = params["win_factor"] if game_result.won else params["loss_factor"]
         
         self.weights["rank_weight"] += learning_rate * score * success_factor
         self.weights["trump_weight"] += learning_rate * score * success_factor
         
         # Корректируем агрессивность на основе результата
-        if game_result.won and game_result.moves_count < 20:
+        if game_result.won and game_result.moves_count < params["quick_win_moves"]:
             self.weights["aggressive_factor"] += learning_rate
         elif not game_result.won:
             self.weights["aggressive_factor"] -= learning_rate
@@ -127,30 +288,35 @@ class LearningEngine:
         # Нормализуем веса
         self._normalize_weights()
     
-    def _analyze_patterns(self):
+    @staticmethod
+    def update_patterns(app_stats: Dict, history: List[Tuple[GameState, GameAction, float]]):
+        """Добавление партии в потоковый счетчик паттернов приложения"""
+        miner = PatternMiner.from_dict(app_stats.get("pattern_miner"))
+        miner.add_game([
+            (action.type, str(action.card) if action.card else "none", score)
+            for _, action, score in history
+        ])
+        app_stats["pattern_miner"] = miner.to_dict()
+        app_stats["typical_patterns"] = miner.top_patterns(TYPICAL_PATTERNS_COUNT)
+    
+    def _analyze_patterns(self, app: str, history: List[Tuple[GameState, GameAction, float]]):
         """Анализ паттернов успешной игры"""
-        if len(self.game_history) < 3:
-            return
-            
-        patterns = []
-        for i in range(len(self.game_history) - 2):
-            pattern = self.game_history[i:i+3]
-            if all(score > 0.7 for _, _, score in pattern):
-                patterns.append([
-                    (a.type, str(a.card) if a.card else "none")
-                    for _, a, _ in pattern
-                ])
-        
-        if patterns:
-            self.app_specific_strategies[self.current_app]["typical_patterns"] = patterns
+        self.update_patterns(self.app_specific_strategies.get(app), history)
     
     def get_strategy_adjustments(self) -> Dict[str, float]:
         """Получение корректировок стратегии для текущего приложения"""
-        if not self.current_app:
+        return self._strategy_adjustments(self.current_app)
+    
+    def _strategy_adjustments(self, app: str) -> Dict[str, float]:
+        if not app:
             return {}
-            
-        app_stats = self.app_specific_strategies[self.current_app]
         
+        with self.lock:
+            app_stats = self.app_specific_strategies.get(app)
+            return self._adjustments_from_stats(app_stats)
+    
+    def _adjustments_from_stats(self, app_stats: Dict) -> Dict[str, float]:
+        """Корректировки по статистике приложения (вызывается под self.lock)"""
         # Рассчитываем корректировки на основе статистики
         adjustments = {
             "rank_weight": 1.0,
@@ -158,29 +324,31 @@ class LearningEngine:
             "aggressive_factor": 1.0
         }
         
+        params = self.params
         if app_stats["games_played"] > 0:
             # Корректируем на основе успешности
             success_rate = app_stats["success_rate"]
-            if success_rate < 0.4:
-                adjustments["aggressive_factor"] = 0.7  # Играем осторожнее
-            elif success_rate > 0.6:
-                adjustments["aggressive_factor"] = 1.3  # Играем агрессивнее
+            if success_rate < params["low_success_rate"]:
+                adjustments["aggressive_factor"] = params["cautious_factor"]  # Играем осторожнее
+            elif success_rate > params["high_success_rate"]:
+                adjustments["aggressive_factor"] = params["aggressive_boost"]  # Играем агрессивнее
             
             # Анализируем предпочтительные ходы
             moves = app_stats["preferred_moves"]
             if moves:
-                best_moves = sorted(
-                    moves.items(),
-                    key=lambda x: x[1]["success"] / x[1]["count"] if x[1]["count"] > 0 else 0,
-                    reverse=True
+                # Нужны только три лучших хода - без сортировки всех (их бывают сотни тысяч)
+                best_moves = heapq.nlargest(
+                    3, moves.items(),
+                    key=lambda x: x[1]["success"] / x[1]["count"] if x[1]["count"] > 0 else 0
                 )
                 
                 # Корректируем веса на основе успешных ходов
-                for move, stats in best_moves[:3]:
-                    if "trump" in move and stats["success"] / stats["count"] > 0.7:
-                        adjustments["trump_weight"] *= 1.2
-                    if "high" in move and stats["success"] / stats["count"] > 0.7:
-                        adjustments["rank_weight"] *= 1.2
+                for move, stats in best_moves:
+                    success = stats["success"] / stats["count"]
+                    if "trump" in move and success > params["best_move_success"]:
+                        adjustments["trump_weight"] *= params["move_weight_boost"]
+                    if "high" in move and success > params["best_move_success"]:
+                        adjustments["rank_weight"] *= params["move_weight_boost"]
         
         return adjustments
     
@@ -193,11 +361,12 @@ class LearningEngine:
     
     def _save_data(self):
         """Сохранение данных обучения"""
+        # Веса загружаются лениво - читаем их до того, как файл будет открыт на запись
+        weights = self.weights
         with open(f"{self.save_dir}/weights.json", "w") as f:
-            json.dump(self.weights, f)
+            json.dump(weights, f)
         
-        with open(f"{self.save_dir}/app_strategies.json", "w") as f:
-            json.dump(self.app_specific_strategies, f)
+        self.app_specific_strategies.flush()
         
         # Сохраняем статистику
         stats = {
@@ -209,10 +378,75 @@ class LearningEngine:
         with open(f"{self.save_dir}/statistics.json", "w") as f:
             json.dump(stats, f)
     
+    def _append_history(self, app: str, history: List[Tuple[GameState, GameAction, float]],
+                        game_result: GameResult):
+        """Дописывание сыгранной партии в журнал для офлайн-обучения (ai/trainer.py)"""
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "app": app,
+            "won": game_result.won,
+            "moves_count": game_result.moves_count,
+            "moves": [
+                [state.to_dict(), action.to_dict(), score]
+                for state, action, score in history
+            ]
+        }
+        with open(f"{self.save_dir}/{HISTORY_FILE}", "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    
     def get_statistics(self):
         """Получение текущей статистики"""
         return {
             "games_played": self.games_played,
             "games_won": self.games_won,
             "win_rate": self.games_won / self.games_played if self.games_played > 0 else 0
-        } 
\ No newline at end of file
+        }
+
+
+class LearningSession:
+    """Состояние одного стола поверх общего LearningEngine.
+
+    История партии и текущее приложение свои, а веса, статистика
+    приложений и файлы - общие; записи в них сериализуются блокировкой
+    движка. Интерфейс совпадает с тем, что DurakAI использует у LearningEngine.
+    """
+    
+    def __init__(self, engine: LearningEngine):
+        self.engine = engine
+        self.game_history: List[Tuple[GameState, GameAction, float]] = []
+        self.current_app = None
+        self._last_window_title = None
+    
+    @property
+    def save_dir(self) -> str:
+        return self.engine.save_dir
+    
+    @property
+    def weights(self) -> Dict[str, float]:
+        return self.engine.weights
+    
+    @property
+    def version(self) -> int:
+        return self.engine.version
+    
+    def detect_current_app(self, window_title: str):
+        if window_title == self._last_window_title:
+            return
+        self._last_window_title = window_title
+        self.current_app = normalize_app_title(window_title)
+        with self.engine.lock:
+            self.engine.app_specific_strategies.get(self.current_app)
+    
+    def record_move(self, state: GameState, action: GameAction, result_score: float):
+        self.game_history.append((state, action, result_score))
+        self.engine._record_app_move(self.current_app, action, result_score)
+    
+    def learn_from_game(self, game_result: GameResult):
+        self.engine._learn(self.current_app, self.game_history, game_result)
+        self.game_history.clear()
+    
+    def get_strategy_adjustments(self) -> Dict[str, float]:
+        return self.engine._strategy_adjustments(self.current_app)
+    
+    def get_statistics(self):
+        return self.engine.get_statistics()
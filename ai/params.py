@@ -0,0 +1,55 @@
+"""Параметры обучения LearningEngine (подбираются ai/tuning.py, хранятся в ai_data/params.json)."""
+import copy
+import json
+import os
+from typing import Dict
+
+PARAMS_FILE = "params.json"
+
+DEFAULT_PARAMS = {
+    # Шаг обновления весов после партии
+    "learning_rate": 0.1,
+    # Множитель оценки хода при победе и поражении
+    "win_factor": 1.0,
+    "loss_factor": -0.5,
+    # Победа быстрее стольких ходов повышает агрессивность
+    "quick_win_moves": 20,
+    # Корректировки стратегии приложения по доле побед
+    "low_success_rate": 0.4,
+    "high_success_rate": 0.6,
+    "cautious_factor": 0.7,
+    "aggressive_boost": 1.3,
+    # Успешность хода, при которой он усиливает вес козырей/рангов, и сам множитель
+    "best_move_success": 0.7,
+    "move_weight_boost": 1.2,
+    # Веса до первого обучения (если нет weights.json)
+    "initial_weights": {
+        "rank_weight": 0.4,
+        "trump_weight": 0.3,
+        "same_rank_weight": 0.1,
+        "opponent_cards_weight": 0.2,
+        "deck_remaining_weight": 0.1,
+        "aggressive_factor": 0.5
+    }
+}
+
+
+def load_params(save_dir: str) -> Dict:
+    """Параметры из save_dir/params.json поверх значений по умолчанию"""
+    params = copy.deepcopy(DEFAULT_PARAMS)
+    try:
+        with open(os.path.join(save_dir, PARAMS_FILE), "r", encoding="utf-8") as f:
+            stored = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return params
+    weights = stored.pop("initial_weights", None)
+    params.update({key: value for key, value in stored.items() if key in params})
+    if weights:
+        params["initial_weights"].update(weights)
+    return params
+
+
+def save_params(path: str, params: Dict):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(params, f, ensure_ascii=False, indent=2)
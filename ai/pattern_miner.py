@@ -0,0 +1,88 @@
+"""Потоковый подсчет частых последовательностей ходов с ограниченной памятью (Space-Saving)."""
+import heapq
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Ход в паттерне: (тип действия, карта или "none")
+Move = Tuple[str, str]
+
+
+class PatternMiner:
+    """Top-k успешных n-грамм ходов по всем партиям приложения.
+
+    Хранится не больше capacity счетчиков; при переполнении вытесняется
+    самый редкий, а его счет переходит новому ключу как оценка ошибки.
+    После каждой партии все счета умножаются на decay, так что старые
+    привычки соперника постепенно забываются.
+    """
+
+    SEPARATOR = "|"
+
+    def __init__(self, n: int = 3, capacity: int = 64, decay: float = 0.95,
+                 min_score: float = 0.7):
+        self.n = n
+        self.capacity = capacity
+        self.decay = decay
+        self.min_score = min_score
+        self.counts: Dict[str, float] = {}
+        self.errors: Dict[str, float] = {}
+
+    @classmethod
+    def encode(cls, pattern: Sequence[Move]) -> str:
+        return cls.SEPARATOR.join(f"{action}:{card}" for action, card in pattern)
+
+    @classmethod
+    def decode(cls, key: str) -> List[Move]:
+        return [tuple(item.split(":", 1)) for item in key.split(cls.SEPARATOR)]
+
+    def add(self, key: str, weight: float = 1.0):
+        if key in self.counts:
+            self.counts[key] += weight
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[key] = weight
+            self.errors[key] = 0.0
+            return
+        victim = min(self.counts, key=self.counts.get)
+        floor = self.counts.pop(victim)
+        del self.errors[victim]
+        self.counts[key] = floor + weight
+        self.errors[key] = floor
+
+    def add_game(self, moves: Sequence[Tuple[str, str, float]]):
+        """Учет партии: moves - (тип действия, карта, оценка хода) по порядку"""
+        for key in self.counts:
+            self.counts[key] *= self.decay
+            self.errors[key] *= self.decay
+
+        run = 0  # длина текущей серии успешных ходов
+        for i, (_, _, score) in enumerate(moves):
+            run = run + 1 if score > self.min_score else 0
+            if run >= self.n:
+                self.add(self.encode([(a, c) for a, c, _ in moves[i - self.n + 1:i + 1]]))
+
+    def top(self, k: Optional[int] = None) -> List[Tuple[str, float]]:
+        if k is None:
+            return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return heapq.nlargest(k, self.counts.items(), key=lambda item: item[1])
+
+    def top_patterns(self, k: Optional[int] = None) -> List[List[Move]]:
+        return [self.decode(key) for key, _ in self.top(k)]
+
+    def to_dict(self) -> Dict:
+        return {
+            "n": self.n,
+            "capacity": self.capacity,
+            "decay": self.decay,
+            "min_score": self.min_score,
+            "counts": self.counts,
+            "errors": self.errors
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> 'PatternMiner':
+        if not data:
+            return cls()
+        miner = cls(data["n"], data["capacity"], data["decay"], data["min_score"])
+        miner.counts = dict(data["counts"])
+        miner.errors = dict(data["errors"])
+        return miner
@@ -0,0 +1,375 @@
+"""Офлайн-обучение на сохраненных партиях.
+
+Запуск из корня проекта:
+    python -m ai.trainer --data-dir ai_data --epochs 200 --workers 4
+
+Журнал делится на части по границам строк; каждый процесс-воркер сам
+читает и разбирает свою часть, держит ее признаки у себя и на каждой
+эпохе возвращает только градиент.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from multiprocessing import Pipe, Process
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from game.durak_game import Card
+from .app_strategies import new_app_stats, normalize_app_title
+from .learning_engine import (LearningEngine, GameState, GameAction, HISTORY_FILE,
+                              TYPICAL_PATTERNS_COUNT)
+from .pattern_miner import PatternMiner
+from .value_model import MODEL_TYPES, N_FEATURES, VALUE_MODEL_FILE, extract_batch, weight_features
+
+# Веса, которые эвристика DurakAI складывает в оценку хода (порядок weight_features).
+# aggressive_factor - общий множитель оценки, а deck_remaining_weight эвристика не
+# использует: оба не подбираются и остаются прежними
+FITTED_WEIGHT_KEYS = [
+    "rank_weight",
+    "trump_weight",
+    "same_rank_weight",
+    "opponent_cards_weight"
+]
+# Масштаб столбцов weight_features: спуск идет по признакам порядка единицы
+# (разница рангов при защите - до 8, одинаковых карт - до 4), веса пересчитываются обратно
+FEATURE_SCALES = np.array([len(Card.RANKS), 1.0, 4.0, 1.0, 1.0])
+# Нижняя граница подобранных весов: при нулевых весах все карты равны и
+# эвристика ходит первой картой руки
+WEIGHT_FLOOR = 0.01
+
+# Доля исхода партии в целевой оценке хода (остальное - оценка самого хода)
+OUTCOME_BLEND = 0.5
+
+# Меньше стольких обучающих ходов - модель ценности не обучается и не сохраняется
+MIN_VALUE_SAMPLES = 200
+
+STATISTICS_FILE = "statistics.json"
+
+
+def log_shards(path: str, count: int) -> List[Tuple[int, int]]:
+    """Деление журнала на count частей (start, end) в байтах по границам строк"""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, "rb") as f:
+        for i in range(1, count):
+            f.seek(size * i // count)
+            f.readline()
+            bounds.append(max(bounds[-1], min(f.tell(), size)))
+    bounds.append(size)
+    shards = [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+    # Пустой журнал - одна пустая часть, чтобы итоги и выборки были определены
+    return shards or [(0, size)]
+
+
+def is_validation(offset: int, val_split: float, seed: int) -> bool:
+    """Партия (по смещению ее строки в журнале) попадает в валидацию.
+
+    Решение не зависит от числа частей, и ходы одной игры не попадают в обе выборки.
+    """
+    return random.Random(f"{seed}:{offset}").random() < val_split
+
+
+def _read_games(path: str, start: int, end: int):
+    """(смещение строки, партия) для строк, начинающихся в [start, end); поврежденные пропускаются"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = start
+        while offset < end:
+            line = f.readline()
+            if not line:
+                break
+            line_offset, offset = offset, offset + len(line)
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_offset, json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+
+
+def _add_game_stats(strategies: Dict[str, Dict], game: Dict,
+                    history: List[Tuple[GameState, GameAction, float]]):
+    """Статистика приложения по одной партии журнала"""
+    app = game.get("app")
+    if not app:
+        return
+    # Старые записи журнала содержат исходный заголовок окна
+    app = normalize_app_title(app)
+    stats = strategies.setdefault(app, {
+        "preferred_moves": {}, "games_played": 0, "games_won": 0, "pattern_games": []
+    })
+    for _, action, score in history:
+        move = stats["preferred_moves"].setdefault(
+            LearningEngine.move_key(action), {"count": 0, "success": 0.0}
+        )
+        move["count"] += 1
+        move["success"] += score
+    stats["games_played"] += 1
+    if game["won"]:
+        stats["games_won"] += 1
+    # Паттерны зависят от порядка партий - их считает главный процесс по всем частям
+    stats["pattern_games"].append([
+        (action.type, str(action.card) if action.card else "none", score)
+        for _, action, score in history
+    ])
+
+
+def load_shard(path: str, start: int, end: int, val_split: float, seed: int,
+               value_features: bool = False) -> Dict:
+    """Разбор части журнала: признаки обучения и валидации, статистика приложений.
+
+    Признаки хода извлекаются один раз (extract_batch модели ценности),
+    признаки весов LearningEngine - их столбцы (weight_features).
+    """
+    rows = {"train": ([], []), "val": ([], [])}
+    strategies: Dict[str, Dict] = {}
+    games = won = 0
+    for offset, game in _read_games(path, start, end):
+        split = "val" if is_validation(offset, val_split, seed) else "train"
+        outcome = 1.0 if game["won"] else 0.0
+        history = []
+        for state_data, action_data, score in game["moves"]:
+            state = GameState.from_dict(state_data)
+            action = GameAction.from_dict(action_data)
+            history.append((state, action, score))
+            rows[split][0].append(extract_batch(state, [action]))
+            rows[split][1].append((1 - OUTCOME_BLEND) * score + OUTCOME_BLEND * outcome)
+        _add_game_stats(strategies, game, history)
+        games += 1
+        won += 1 if game["won"] else 0
+
+    shard = {"strategies": strategies, "games": games, "games_won": won}
+    for split, (features, targets) in rows.items():
+        features = np.concatenate(features) if features else np.zeros((0, N_FEATURES), dtype=np.float32)
+        shard[split] = (weight_features(features) / FEATURE_SCALES,
+                        np.asarray(targets, dtype=np.float64))
+        if value_features:
+            shard[f"value_{split}"] = (features, np.asarray(targets, dtype=np.float32))
+    return shard
+
+
+def _shard_worker(conn, task: Tuple):
+    """Процесс-воркер: разбирает свою часть журнала, затем по весам возвращает градиент"""
+    shard = load_shard(*task)
+    x, y = shard.pop("train")
+    val_x, val_y = shard.pop("val")
+    shard.update(samples=len(y), val_samples=len(val_y))
+    conn.send(shard)
+    while True:
+        weights = conn.recv()
+        if weights is None:
+            break
+        error = x @ weights - y
+        val_error = val_x @ weights - val_y
+        conn.send((x.T @ error * 2, float(error @ error), float(val_error @ val_error)))
+    conn.close()
+
+
+class ShardWorkers:
+    """Процессы-воркеры, по одному на часть журнала"""
+
+    def __init__(self, path: str, workers: int, val_split: float, seed: int,
+                 value_features: bool = False):
+        self.connections = []
+        self.processes = []
+        for start, end in log_shards(path, workers):
+            parent, child = Pipe()
+            process = Process(target=_shard_worker, daemon=True,
+                              args=(child, (path, start, end, val_split, seed, value_features)))
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+        # Итоги разбора частей в порядке журнала
+        self.shards = [conn.recv() for conn in self.connections]
+        self.samples = sum(shard["samples"] for shard in self.shards)
+        self.val_samples = sum(shard["val_samples"] for shard in self.shards)
+
+    def evaluate(self, weights: np.ndarray) -> Tuple[np.ndarray, float, float]:
+        """Градиент MSE, train_mse и val_mse по всем частям"""
+        for conn in self.connections:
+            conn.send(weights)
+        results = [conn.recv() for conn in self.connections]
+        gradient = sum(r[0] for r in results) / max(1, self.samples)
+        train_loss = sum(r[1] for r in results) / max(1, self.samples)
+        val_loss = sum(r[2] for r in results) / max(1, self.val_samples)
+        return gradient, train_loss, val_loss
+
+    def close(self):
+        for conn in self.connections:
+            conn.send(None)
+            conn.close()
+        for process in self.processes:
+            process.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def fit_weights(workers: ShardWorkers, initial: np.ndarray, epochs: int,
+                learning_rate: float, verbose: bool = True) -> np.ndarray:
+    """Градиентный спуск, части выборки считаются параллельно в процессах-воркерах"""
+    weights = initial.copy()
+    n = workers.samples
+    if n == 0:
+        return weights
+
+    started = time.perf_counter()
+    for epoch in range(1, epochs + 1):
+        gradient, train_loss, _ = workers.evaluate(weights)
+        weights -= learning_rate * gradient
+        # Последний столбец - свободный член, он не ограничивается
+        np.clip(weights[:-1], WEIGHT_FLOOR * FEATURE_SCALES[:-1], None, out=weights[:-1])
+
+        if verbose and (epoch == 1 or epoch == epochs or epoch % 10 == 0):
+            elapsed = time.perf_counter() - started
+            throughput = n * epoch / elapsed if elapsed > 0 else 0.0
+            print(
+                f"Эпоха {epoch}/{epochs}: train_mse={train_loss:.5f}, "
+                f"val_mse={workers.evaluate(weights)[2]:.5f}, "
+                f"{throughput:,.0f} samples/s"
+            )
+    return weights
+
+
+def build_app_strategies(shards: List[Dict]) -> Dict[str, Dict]:
+    """Статистика приложений по журналу: части суммируются, паттерны - по партиям в порядке журнала"""
+    strategies: Dict[str, Dict] = {}
+    miners: Dict[str, PatternMiner] = {}
+    for shard in shards:
+        for app, logged in shard["strategies"].items():
+            stats = strategies.setdefault(app, dict(new_app_stats(), games_won=0))
+            for key, move in logged["preferred_moves"].items():
+                total = stats["preferred_moves"].setdefault(key, {"count": 0, "success": 0.0})
+                total["count"] += move["count"]
+                total["success"] += move["success"]
+            stats["games_played"] += logged["games_played"]
+            stats["games_won"] += logged["games_won"]
+            miner = miners.setdefault(app, PatternMiner())
+            for moves in logged["pattern_games"]:
+                miner.add_game(moves)
+
+    for app, stats in strategies.items():
+        stats["success_rate"] = stats["games_won"] / stats["games_played"]
+        stats["pattern_miner"] = miners[app].to_dict()
+        stats["typical_patterns"] = miners[app].top_patterns(TYPICAL_PATTERNS_COUNT)
+        del stats["games_won"]
+    return strategies
+
+
+def merge_app_stats(existing: Dict, logged: Dict) -> Dict:
+    """Объединение сохраненной статистики приложения с пересчитанной по журналу.
+
+    Обе описывают в основном одни и те же партии (живая игра пишет и
+    статистику, и журнал), поэтому счетчики не складываются: для каждого
+    хода и для статистики партий остается источник с большим числом
+    наблюдений. Ходы и приложения, которых нет в журнале, сохраняются.
+    """
+    merged = dict(existing)
+    moves = dict(existing.get("preferred_moves", {}))
+    for key, move in logged["preferred_moves"].items():
+        if move["count"] > moves.get(key, {"count": 0})["count"]:
+            moves[key] = move
+    merged["preferred_moves"] = moves
+    if logged["games_played"] > existing.get("games_played", 0):
+        for key in ("games_played", "success_rate", "pattern_miner", "typical_patterns"):
+            merged[key] = logged[key]
+    return merged
+
+
+def load_statistics(save_dir: str) -> Dict:
+    try:
+        with open(os.path.join(save_dir, STATISTICS_FILE), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Офлайн-обучение весов DurakAI по журналу партий")
+    parser.add_argument("--data-dir", default="ai_data", help="каталог с history.jsonl")
+    parser.add_argument("--out-dir", default=None, help="куда записать веса (по умолчанию --data-dir)")
+    parser.add_argument("--epochs", type=int, default=200)
+    parser.add_argument("--learning-rate", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--val-split", type=float, default=0.2, help="доля партий для валидации")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--value-model", choices=sorted(MODEL_TYPES), default=None,
+                        help="дополнительно обучить модель ценности ходов")
+    args = parser.parse_args(argv)
+
+    out_dir = args.out_dir or args.data_dir
+    history_path = os.path.join(args.data_dir, HISTORY_FILE)
+    if not os.path.exists(history_path):
+        parser.error(f"Журнал партий не найден: {history_path}")
+
+    workers = max(1, args.workers)
+    load_started = time.perf_counter()
+    with ShardWorkers(history_path, workers, args.val_split, args.seed,
+                      value_features=bool(args.value_model)) as pool:
+        games = sum(shard["games"] for shard in pool.shards)
+        games_won = sum(shard["games_won"] for shard in pool.shards)
+        print(
+            f"Партий: {games}, частей журнала: {len(pool.shards)}, "
+            f"ходов: {pool.samples} обучение / {pool.val_samples} валидация, "
+            f"загрузка {time.perf_counter() - load_started:.2f} с"
+        )
+
+        engine = LearningEngine(save_dir=out_dir)
+        # Свободный член регрессии не сохраняется: порядок ходов от него не зависит
+        initial = np.array(
+            [engine.weights.get(key, WEIGHT_FLOOR) for key in FITTED_WEIGHT_KEYS] + [0.0]
+        ) * FEATURE_SCALES
+
+        fit_started = time.perf_counter()
+        weights = fit_weights(pool, initial, args.epochs, args.learning_rate)
+        elapsed = time.perf_counter() - fit_started
+        if elapsed > 0 and pool.samples:
+            print(f"Обучение: {elapsed:.2f} с, {pool.samples * args.epochs / elapsed:,.0f} samples/s")
+        print(f"val_mse: {pool.evaluate(initial)[2]:.5f} -> {pool.evaluate(weights)[2]:.5f}")
+        shards = pool.shards
+
+    if args.value_model:
+        train_x, train_y = (np.concatenate(parts) for parts in
+                            zip(*(shard["value_train"] for shard in shards)))
+        val_x, val_y = (np.concatenate(parts) for parts in
+                        zip(*(shard["value_val"] for shard in shards)))
+        if len(train_y) < MIN_VALUE_SAMPLES:
+            # Необученная модель заменила бы эвристику в DurakAI - прежний файл модели остается
+            print(f"Модель ценности не обучена: {len(train_y)} обучающих ходов, "
+                  f"нужно не меньше {MIN_VALUE_SAMPLES}")
+        else:
+            model_started = time.perf_counter()
+            model = MODEL_TYPES[args.value_model]().fit(train_x, train_y, seed=args.seed)
+            elapsed = time.perf_counter() - model_started
+            val_error = float(np.mean((model.predict(val_x) - val_y) ** 2)) if len(val_y) else 0.0
+            print(f"Модель ценности ({args.value_model}): {elapsed:.2f} с, val_mse={val_error:.5f}")
+            model.save(os.path.join(out_dir, VALUE_MODEL_FILE))
+
+    # Без нормализации: она изменила бы подобранную функцию относительно остальных весов
+    engine.weights = dict(engine.weights, **{
+        key: float(value) for key, value in zip(FITTED_WEIGHT_KEYS, weights / FEATURE_SCALES)
+    })
+    strategies = build_app_strategies(shards)
+    store = engine.app_specific_strategies
+    for app, stats in strategies.items():
+        store.put(app, merge_app_stats(store.get(app), stats))
+    # Общая статистика - по тому же правилу, что и статистика приложений
+    saved = load_statistics(out_dir)
+    if saved.get("games_played", 0) > games:
+        games, games_won = saved["games_played"], saved.get("games_won", 0)
+    engine.games_played = games
+    engine.games_won = games_won
+    engine._save_data()
+    print(f"Веса и стратегии {len(strategies)} приложений сохранены в {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""Подбор параметров обучения LearningEngine эволюционным поиском на симулированных партиях.
+
+Запуск из корня проекта:
+    python -m ai.tuning --generations 20 --population 16 --games 200 --workers 8
+    python -m ai.tuning --resume          # продолжить с контрольной точки
+
+Кандидат - набор параметров ai/params.py (включая начальные веса). Он
+играет --games партий против DurakAI с параметрами по умолчанию и учится
+по ходу, как в обычной игре; оценка - доля побед (ничья - половина).
+Все кандидаты поколения играют одни и те же раздачи. Кандидат, у
+которого даже верхняя граница доверительного интервала ниже лучшего
+результата прошлых поколений, досрочно снимается. Лучшие параметры
+записываются в ai_data/params.json и подхватываются LearningEngine.
+"""
+import argparse
+import copy
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple
+
+from game.simulator import DurakSimulator
+from .durak_ai import DurakAI
+from .learning_engine import LearningEngine
+from .params import DEFAULT_PARAMS, PARAMS_FILE, save_params
+
+CHECKPOINT_FILE = "tuning_checkpoint.json"
+
+# Параметр -> (минимум, максимум, целое ли)
+SEARCH_SPACE = {
+    "learning_rate": (0.005, 0.3, False),
+    "win_factor": (0.1, 2.0, False),
+    "loss_factor": (-2.0, 0.0, False),
+    "quick_win_moves": (5, 60, True),
+    "low_success_rate": (0.1, 0.5, False),
+    "high_success_rate": (0.5, 0.9, False),
+    "cautious_factor": (0.3, 1.0, False),
+    "aggressive_boost": (1.0, 2.0, False),
+    "best_move_success": (0.3, 0.95, False),
+    "move_weight_boost": (1.0, 2.0, False),
+    "initial_weights.rank_weight": (0.0, 1.0, False),
+    "initial_weights.trump_weight": (0.0, 1.0, False),
+    "initial_weights.same_rank_weight": (0.0, 1.0, False),
+    "initial_weights.opponent_cards_weight": (0.0, 1.0, False),
+    "initial_weights.deck_remaining_weight": (0.0, 1.0, False),
+    "initial_weights.aggressive_factor": (0.0, 1.0, False)
+}
+
+# Множитель полуширины интервала Хёффдинга для досрочного снятия (~95%)
+PRUNE_CONFIDENCE = math.sqrt(math.log(1 / 0.05) / 2)
+
+
+def flatten(params: Dict) -> Dict[str, float]:
+    """{"initial_weights": {"rank_weight": ...}} -> {"initial_weights.rank_weight": ...}"""
+    flat = {}
+    for key, value in params.items():
+        if isinstance(value, dict):
+            for inner, inner_value in value.items():
+                flat[f"{key}.{inner}"] = inner_value
+        else:
+            flat[key] = value
+    return flat
+
+
+def unflatten(flat: Dict[str, float]) -> Dict:
+    params = copy.deepcopy(DEFAULT_PARAMS)
+    for key, value in flat.items():
+        if "." in key:
+            outer, inner = key.split(".", 1)
+            params[outer][inner] = value
+        else:
+            params[key] = value
+    return params
+
+
+def _clip(name: str, value: float) -> float:
+    low, high, is_int = SEARCH_SPACE[name]
+    value = min(max(value, low), high)
+    return int(round(value)) if is_int else round(value, 5)
+
+
+def random_candidate(rng: random.Random) -> Dict[str, float]:
+    return {name: _clip(name, rng.uniform(low, high))
+            for name, (low, high, _) in SEARCH_SPACE.items()}
+
+
+def mutate(parent: Dict[str, float], rng: random.Random, sigma: float) -> Dict[str, float]:
+    """Гауссов шаг по каждому параметру, sigma - доля диапазона"""
+    child = dict(parent)
+    for name, (low, high, _) in SEARCH_SPACE.items():
+        child[name] = _clip(name, parent[name] + rng.gauss(0.0, sigma * (high - low)))
+    return child
+
+
+def crossover(a: Dict[str, float], b: Dict[str, float], rng: random.Random) -> Dict[str, float]:
+    return {name: a[name] if rng.random() < 0.5 else b[name] for name in SEARCH_SPACE}
+
+
+def evaluate(task: Tuple[int, Dict[str, float], int, int, int, float]) -> Dict:
+    """Партии кандидата против параметров по умолчанию (в процессе пула).
+
+    task: индекс, кандидат, число партий, seed раздач, размер порции,
+    порог досрочного снятия. Результат: index, fitness, games, pruned.
+    """
+    index, candidate, games, seed, chunk, threshold = task
+    with tempfile.TemporaryDirectory() as save_dir:
+        player = DurakAI(LearningEngine(os.path.join(save_dir, "candidate"),
+                                        params=unflatten(candidate)))
+        opponent = DurakAI(LearningEngine(os.path.join(save_dir, "opponent"),
+                                          params=copy.deepcopy(DEFAULT_PARAMS)))
+        # Только эвристика: обученная модель ценности из ai_data не участвует
+        player.value_model = None
+        opponent.value_model = None
+        simulator = DurakSimulator(seed)
+
+        points = 0.0
+        played = 0
+        pruned = False
+        while played < games:
+            for _ in range(min(chunk, games - played)):
+                # Места чередуются, чтобы не давать преимущества первому ходу
+                seat = played % 2
+                players = [player, opponent] if seat == 0 else [opponent, player]
+                winner = simulator.play(players)
+                if winner is None:
+                    points += 0.5
+                elif winner == seat:
+                    points += 1.0
+                player.end_game(winner == seat)
+                _reset(opponent)
+                played += 1
+
+            upper = points / played + PRUNE_CONFIDENCE / math.sqrt(played)
+            if played < games and upper < threshold:
+                pruned = True
+                break
+
+    return {"index": index, "fitness": points / played, "games": played, "pruned": pruned}
+
+
+def _reset(ai: DurakAI):
+    """Соперник не учится: история партии просто сбрасывается"""
+    ai.learning_engine.game_history.clear()
+    ai.last_state = None
+    ai.last_action = None
+    ai.current_game_moves = 0
+
+
+def save_checkpoint(path: str, state: Dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def next_population(scored: List[Tuple[float, Dict[str, float]]], size: int, elite: int,
+                    sigma: float, rng: random.Random) -> List[Dict[str, float]]:
+    """Лучшие elite переходят как есть, остальные - скрещивание лучших и мутация"""
+    scored = sorted(scored, key=lambda item: item[0], reverse=True)
+    parents = [candidate for _, candidate in scored[:max(2, elite)]]
+    population = [dict(candidate) for candidate in parents[:elite]]
+    while len(population) < size:
+        a, b = rng.sample(parents, 2)
+        population.append(mutate(crossover(a, b, rng), rng, sigma))
+    return population
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Подбор параметров обучения на симулированных партиях")
+    parser.add_argument("--data-dir", default="ai_data", help=f"куда записать {PARAMS_FILE}")
+    parser.add_argument("--generations", type=int, default=20)
+    parser.add_argument("--population", type=int, default=16)
+    parser.add_argument("--elite", type=int, default=4)
+    parser.add_argument("--games", type=int, default=200, help="партий на кандидата")
+    parser.add_argument("--chunk", type=int, default=50, help="партий между проверками досрочного снятия")
+    parser.add_argument("--sigma", type=float, default=0.15, help="шаг мутации, доля диапазона")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--checkpoint", default=None,
+                        help=f"контрольная точка (по умолчанию <data-dir>/{CHECKPOINT_FILE})")
+    parser.add_argument("--resume", action="store_true", help="продолжить с контрольной точки")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    checkpoint_path = args.checkpoint or os.path.join(args.data_dir, CHECKPOINT_FILE)
+    state = load_checkpoint(checkpoint_path) if args.resume else None
+    if state is None:
+        rng = random.Random(args.seed)
+        # Текущие параметры по умолчанию - один из кандидатов первого поколения
+        population = [flatten(DEFAULT_PARAMS)]
+        population += [random_candidate(rng) for _ in range(args.population - 1)]
+        state = {"generation": 0, "population": population, "best": None, "history": []}
+    else:
+        print(f"Продолжение с поколения {state['generation']}")
+
+    with Pool(max(1, args.workers)) as pool:
+        while state["generation"] < args.generations:
+            generation = state["generation"]
+            started = time.perf_counter()
+            best = state["best"]
+            threshold = best["fitness"] if best else 0.0
+            # Раздачи одинаковы для всего поколения и меняются между поколениями
+            deal_seed = args.seed * 1000003 + generation
+            tasks = [
+                (index, candidate, args.games, deal_seed, args.chunk, threshold)
+                for index, candidate in enumerate(state["population"])
+            ]
+            results = sorted(pool.imap_unordered(evaluate, tasks), key=lambda r: r["index"])
+
+            scored = [(r["fitness"], state["population"][r["index"]]) for r in results]
+            leader_fitness = max(fitness for fitness, _ in scored)
+            leader_result = max((r for r in results if not r["pruned"]),
+                                key=lambda r: r["fitness"], default=None)
+            # Лучшим считается только кандидат, сыгравший все партии
+            if leader_result and (best is None or leader_result["fitness"] > best["fitness"]):
+                best = state["best"] = {
+                    "fitness": leader_result["fitness"],
+                    "generation": generation,
+                    "candidate": state["population"][leader_result["index"]]
+                }
+
+            games_played = sum(r["games"] for r in results)
+            elapsed = time.perf_counter() - started
+            state["history"].append({
+                "generation": generation,
+                "leader": leader_fitness,
+                "best": best["fitness"] if best else None,
+                "pruned": sum(1 for r in results if r["pruned"]),
+                "games": games_played,
+                "seconds": round(elapsed, 2)
+            })
+            print(
+                f"Поколение {generation}: лидер {leader_fitness:.3f}, "
+                f"лучший {best['fitness'] if best else 0.0:.3f}, "
+                f"снято {state['history'][-1]['pruned']}/{len(results)}, "
+                f"{games_played / elapsed:.0f} партий/с"
+            )
+
+            rng = random.Random(args.seed * 7919 + generation)
+            state["population"] = next_population(scored, args.population, args.elite,
+                                                  args.sigma, rng)
+            state["generation"] = generation + 1
+            save_checkpoint(checkpoint_path, state)
+
+    if state["best"]:
+        params_path = os.path.join(args.data_dir, PARAMS_FILE)
+        save_params(params_path, unflatten(state["best"]["candidate"]))
+        print(f"Лучшие параметры (доля побед {state['best']['fitness']:.3f}) записаны в {params_path}")
+
+
+if __name__ == "__main__":
+    main()
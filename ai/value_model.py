@@ -0,0 +1,266 @@
+"""Модель ценности ходов: признаки GameState + GameAction и пакетная оценка на NumPy."""
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from game.durak_game import Card
+from .learning_engine import GameState, GameAction
+
+VALUE_MODEL_FILE = "value_model.npz"
+
+ACTION_TYPES = ["attack", "defend", "add", "take", "done"]
+
+STATE_FEATURES = [
+    "bias",
+    "hand_size",
+    "hand_trumps",
+    "hand_high_cards",
+    "opponent_cards",
+    "opponent_low",
+    "deck_remaining",
+    "deck_empty",
+    "table_size"
+]
+ACTION_FEATURES = [f"action_{t}" for t in ACTION_TYPES] + [
+    "card_rank",
+    "card_trump",
+    "card_same_rank",
+    "defense_rank_gap",
+    "defense_trump_over_plain"
+]
+FEATURE_NAMES = STATE_FEATURES + ACTION_FEATURES
+N_FEATURES = len(FEATURE_NAMES)
+
+_RANK_INDEX = {rank: i for i, rank in enumerate(Card.RANKS)}
+_HIGH_RANK = _RANK_INDEX['Q']
+_DECK_SIZE = len(Card.SUITS) * len(Card.RANKS)
+_ACTION_OFFSET = len(STATE_FEATURES)
+_CARD_OFFSET = _ACTION_OFFSET + len(ACTION_TYPES)
+
+
+def _state_features(state: GameState) -> List[float]:
+    hand = state.hand
+    hand_size = len(hand)
+    trumps = sum(1 for c in hand if c.suit == state.trump_suit)
+    high = sum(1 for c in hand if _RANK_INDEX[c.rank] >= _HIGH_RANK)
+    return [
+        1.0,
+        hand_size / _DECK_SIZE,
+        trumps / hand_size if hand_size else 0.0,
+        high / hand_size if hand_size else 0.0,
+        state.opponent_cards / _DECK_SIZE,
+        1.0 if state.opponent_cards <= 2 else 0.0,
+        state.deck_remaining / _DECK_SIZE,
+        1.0 if state.deck_remaining == 0 else 0.0,
+        len(state.table) / 12
+    ]
+
+
+def extract_batch(state: GameState, actions: List[GameAction]) -> np.ndarray:
+    """Матрица признаков (len(actions), N_FEATURES) для всех ходов из одного состояния"""
+    out = np.zeros((len(actions), N_FEATURES), dtype=np.float32)
+    out[:, :_ACTION_OFFSET] = _state_features(state)
+
+    hand = state.hand
+    rank_counts = {}
+    for c in hand:
+        rank_counts[c.rank] = rank_counts.get(c.rank, 0) + 1
+    attacking = state.table[-1] if len(state.table) % 2 == 1 else None
+
+    for i, action in enumerate(actions):
+        out[i, _ACTION_OFFSET + ACTION_TYPES.index(action.type)] = 1.0
+        card = action.card
+        if not card:
+            continue
+        is_trump = card.suit == state.trump_suit
+        row = out[i, _CARD_OFFSET:]
+        row[0] = _RANK_INDEX[card.rank] / (len(Card.RANKS) - 1)
+        row[1] = 1.0 if is_trump else 0.0
+        row[2] = rank_counts.get(card.rank, 0) / len(hand) if hand else 0.0
+        if action.type == "defend" and attacking is not None:
+            row[3] = (_RANK_INDEX[card.rank] - _RANK_INDEX[attacking.rank]) / len(Card.RANKS)
+            row[4] = 1.0 if is_trump and attacking.suit != state.trump_suit else 0.0
+    return out
+
+
+def extract_features(state: GameState, action: GameAction) -> np.ndarray:
+    return extract_batch(state, [action])[0]
+
+
+_COLUMN = {name: i for i, name in enumerate(FEATURE_NAMES)}
+
+
+def weight_features(features: np.ndarray) -> np.ndarray:
+    """Признаки линейных весов эвристики DurakAI из матрицы extract_batch.
+
+    Столбцы - rank_weight, trump_weight, same_rank_weight,
+    opponent_cards_weight (порядок trainer.FITTED_WEIGHT_KEYS) и свободный
+    член. Значение строки - предпочтение хода в эвристике: для хода
+    _calculate_attack_score без множителя aggressive_factor, для
+    подкидывания и защиты - со знаком минус (там выбирается карта с
+    наименьшей оценкой). У "беру" и "бито" признаки нулевые.
+    """
+    column = lambda name: features[:, _COLUMN[name]].astype(np.float64)
+    attack, add, defend = column("action_attack"), column("action_add"), column("action_defend")
+    # +1 для хода, -1 для подкидывания: обе оценки - _calculate_attack_score
+    attack_sign = attack - add
+    hand_size = np.rint(column("hand_size") * _DECK_SIZE)
+    rank = column("card_rank") * (len(Card.RANKS) - 1) / len(Card.RANKS)
+    same_rank = np.rint(column("card_same_rank") * hand_size)
+    rank_gap = column("defense_rank_gap") * len(Card.RANKS)
+    return np.stack([
+        attack_sign * rank - defend * rank_gap,
+        attack_sign * column("card_trump") - defend * column("defense_trump_over_plain"),
+        attack_sign * same_rank,
+        attack_sign * column("opponent_low") + defend * (hand_size <= 3),
+        np.ones(len(features))
+    ], axis=1)
+
+
+def style_bonus(features: np.ndarray, aggressive: bool,
+                adjustments: Dict[str, float]) -> np.ndarray:
+    """Поправка стиля игры к оценкам модели для матрицы extract_batch.
+
+    Модель учится только на исходах партий, а переключатель режима и
+    корректировки приложения задают стиль: в агрессивном режиме ходы и
+    подкидывание ценятся выше, а ход козырем ниже (как в эвристике
+    DurakAI), в осторожном - наоборот. Сила поправки - множитель
+    aggressive_factor приложения.
+    """
+    sign = 1.0 if aggressive else -1.0
+    pressure = features[:, _COLUMN["action_attack"]] + features[:, _COLUMN["action_add"]]
+    trumps = features[:, _COLUMN["card_trump"]] * adjustments.get("trump_weight", 1.0)
+    bonus = sign * adjustments.get("aggressive_factor", 1.0) * (pressure - trumps)
+    # Успешные ходы старшими картами в этом приложении поднимают их оценку
+    bonus += (adjustments.get("rank_weight", 1.0) - 1.0) * features[:, _COLUMN["card_rank"]]
+    return bonus
+
+
+class ValueModel:
+    """Базовый класс: оценка ожидаемого результата хода по вектору признаков"""
+    kind = ""
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def fit(self, features: np.ndarray, targets: np.ndarray, **kwargs):
+        raise NotImplementedError
+
+    def _arrays(self) -> dict:
+        raise NotImplementedError
+
+    def evaluate_actions(self, state: GameState, actions: List[GameAction]) -> np.ndarray:
+        """Оценки всех ходов за один вызов модели"""
+        if not actions:
+            return np.zeros(0, dtype=np.float32)
+        return self.predict(extract_batch(state, actions))
+
+    def save(self, path: str):
+        # float32 и сжатие - файл весов занимает единицы килобайт
+        arrays = {k: np.asarray(v, dtype=np.float32) for k, v in self._arrays().items()}
+        with open(path, "wb") as f:
+            np.savez_compressed(f, kind=np.array(self.kind), **arrays)
+
+
+class LinearValueModel(ValueModel):
+    kind = "linear"
+
+    def __init__(self, weights: Optional[np.ndarray] = None):
+        if weights is None:
+            weights = np.zeros(N_FEATURES, dtype=np.float32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        return features @ self.weights
+
+    def fit(self, features: np.ndarray, targets: np.ndarray, l2: float = 1e-3, **kwargs):
+        """Гребневая регрессия в замкнутой форме"""
+        x = np.asarray(features, dtype=np.float64)
+        gram = x.T @ x + l2 * len(x) * np.eye(x.shape[1])
+        self.weights = np.linalg.solve(gram, x.T @ targets).astype(np.float32)
+        return self
+
+    def _arrays(self) -> dict:
+        return {"weights": self.weights}
+
+
+class MLPValueModel(ValueModel):
+    """Один скрытый слой ReLU"""
+    kind = "mlp"
+
+    def __init__(self, hidden: int = 16, seed: int = 0, params: Optional[dict] = None):
+        if params is None:
+            rng = np.random.default_rng(seed)
+            params = {
+                "w1": rng.normal(0.0, np.sqrt(2.0 / N_FEATURES), (N_FEATURES, hidden)),
+                "b1": np.zeros(hidden),
+                "w2": rng.normal(0.0, np.sqrt(1.0 / hidden), hidden),
+                "b2": np.zeros(1)
+            }
+        self.w1 = np.asarray(params["w1"], dtype=np.float32)
+        self.b1 = np.asarray(params["b1"], dtype=np.float32)
+        self.w2 = np.asarray(params["w2"], dtype=np.float32)
+        self.b2 = np.asarray(params["b2"], dtype=np.float32)
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        hidden = np.maximum(features @ self.w1 + self.b1, 0.0)
+        return hidden @ self.w2 + self.b2[0]
+
+    def fit(self, features: np.ndarray, targets: np.ndarray, epochs: int = 50,
+            learning_rate: float = 0.01, batch_size: int = 256, seed: int = 0, **kwargs):
+        """Мини-батчевый Adam по MSE"""
+        rng = np.random.default_rng(seed)
+        x_all = np.asarray(features, dtype=np.float32)
+        y_all = np.asarray(targets, dtype=np.float32)
+        params = [self.w1, self.b1, self.w2, self.b2]
+        m = [np.zeros_like(p) for p in params]
+        v = [np.zeros_like(p) for p in params]
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        step = 0
+
+        for _ in range(epochs):
+            order = rng.permutation(len(x_all))
+            for start in range(0, len(order), batch_size):
+                idx = order[start:start + batch_size]
+                x, y = x_all[idx], y_all[idx]
+                pre = x @ self.w1 + self.b1
+                hidden = np.maximum(pre, 0.0)
+                error = (hidden @ self.w2 + self.b2[0] - y) * (2.0 / len(y))
+
+                grad_hidden = np.outer(error, self.w2) * (pre > 0)
+                grads = [x.T @ grad_hidden, grad_hidden.sum(axis=0),
+                         hidden.T @ error, np.array([error.sum()], dtype=np.float32)]
+
+                step += 1
+                for p, g, mi, vi in zip(params, grads, m, v):
+                    mi *= beta1
+                    mi += (1 - beta1) * g
+                    vi *= beta2
+                    vi += (1 - beta2) * g * g
+                    m_hat = mi / (1 - beta1 ** step)
+                    v_hat = vi / (1 - beta2 ** step)
+                    p -= learning_rate * m_hat / (np.sqrt(v_hat) + eps)
+        return self
+
+    def _arrays(self) -> dict:
+        return {"w1": self.w1, "b1": self.b1, "w2": self.w2, "b2": self.b2}
+
+
+MODEL_TYPES = {
+    LinearValueModel.kind: LinearValueModel,
+    MLPValueModel.kind: MLPValueModel
+}
+
+
+def load_value_model(path: str) -> Optional[ValueModel]:
+    """Загрузка модели из .npz, None если файла нет"""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        kind = str(data["kind"])
+        if kind == LinearValueModel.kind:
+            return LinearValueModel(data["weights"])
+        if kind == MLPValueModel.kind:
+            return MLPValueModel(params={k: data[k] for k in ("w1", "b1", "w2", "b2")})
+    raise ValueError(f"Неизвестный тип модели: {kind}")
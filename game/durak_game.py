@@ -4,6 +4,9 @@ from typing import List, Optional
 class Card:
     SUITS = ['♠', '♣', '♥', '♦']
     RANKS = ['6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+    DECK_SIZE = 36
+    
+    __slots__ = ('suit', 'rank')
     
     def __init__(self, suit: str, rank: str):
         self.suit = suit
@@ -12,11 +15,56 @@ class Card:
     def __str__(self):
         return f"{self.rank}{self.suit}"
     
+    def __repr__(self):
+        return f"Card({self.suit!r}, {self.rank!r})"
+    
+    def __eq__(self, other):
+        if not isinstance(other, Card):
+            return NotImplemented
+        return self.suit == other.suit and self.rank == other.rank
+    
+    def __hash__(self):
+        return hash((self.suit, self.rank))
+    
+    @property
+    def index(self) -> int:
+        """Номер карты 0..35 (масть * 9 + ранг), используется в битовых масках"""
+        return self.SUITS.index(self.suit) * len(self.RANKS) + self.RANKS.index(self.rank)
+    
+    @classmethod
+    def from_index(cls, index: int) -> 'Card':
+        return _CARDS_BY_INDEX[index]
+    
+    @classmethod
+    def from_str(cls, text: str) -> 'Card':
+        """Обратное преобразование для __str__: "10♥" -> Card('♥', '10')"""
+        return cls(text[-1], text[:-1])
+    
     def can_beat(self, other: 'Card', trump_suit: str) -> bool:
         if self.suit == other.suit:
             return self.RANKS.index(self.rank) > self.RANKS.index(other.rank)
         return self.suit == trump_suit
 
+# Общие экземпляры для from_index; карты не изменяются после создания
+_CARDS_BY_INDEX = [Card(suit, rank) for suit in Card.SUITS for rank in Card.RANKS]
+
+
+def cards_to_mask(cards) -> int:
+    """Набор карт в 36-битную маску"""
+    mask = 0
+    for card in cards:
+        mask |= 1 << card.index
+    return mask
+
+
+def mask_to_cards(mask: int) -> List[Card]:
+    cards = []
+    while mask:
+        low = mask & -mask
+        cards.append(_CARDS_BY_INDEX[low.bit_length() - 1])
+        mask ^= low
+    return cards
+
 class DurakGame:
     def __init__(self):
         self.deck: List[Card] = []
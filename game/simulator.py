@@ -0,0 +1,103 @@
+"""Партия "подкидного дурака" на двоих между двумя DurakAI без экрана (для ai/tuning.py)."""
+import random
+from typing import List, Optional, Sequence
+
+from .durak_game import Card
+
+HAND_SIZE = 6
+# Больше стольких карт за один заход не подкидывают
+MAX_ATTACK = 6
+
+
+class DurakSimulator:
+    """Правила упрощены: подкидывает только атакующий, взявший карты
+    пропускает ход, партия заканчивается, когда колода пуста и у кого-то
+    не осталось карт. Недопустимый ход ИИ заменяется на "бито"/"беру"
+    (при пустом столе - ход младшей картой).
+    """
+
+    def __init__(self, seed: Optional[int] = None, max_bouts: int = 200,
+                 window_title: str = "Simulation"):
+        self.rng = random.Random(seed)
+        self.max_bouts = max_bouts
+        # Заголовок для detect_current_app: корректировки стратегии приложения тоже участвуют
+        self.window_title = window_title
+
+    def play(self, players: Sequence) -> Optional[int]:
+        """Индекс победителя (0 или 1), None - ничья или партия не закончилась за max_bouts"""
+        deck = [Card.from_index(i) for i in range(Card.DECK_SIZE)]
+        self.rng.shuffle(deck)
+        # Козырь лежит под колодой и достается последним
+        trump_suit = deck[0].suit
+        hands: List[List[Card]] = [[], []]
+        self._draw(hands, deck, 0)
+        for player in players:
+            player.trump_suit = trump_suit
+
+        attacker = self._first_attacker(hands, trump_suit)
+        for _ in range(self.max_bouts):
+            defender = 1 - attacker
+            taken = self._bout(players, hands, deck, attacker, defender, trump_suit)
+            self._draw(hands, deck, attacker)
+
+            if not deck:
+                empty = [not hand for hand in hands]
+                if all(empty):
+                    return None
+                if any(empty):
+                    return empty.index(True)
+            if not taken:
+                attacker = defender
+        return None
+
+    @staticmethod
+    def _draw(hands: List[List[Card]], deck: List[Card], first: int):
+        for index in (first, 1 - first):
+            hand = hands[index]
+            while len(hand) < HAND_SIZE and deck:
+                hand.append(deck.pop())
+
+    @staticmethod
+    def _first_attacker(hands: List[List[Card]], trump_suit: str) -> int:
+        """Первым ходит игрок с младшим козырем"""
+        lowest = [
+            min((Card.RANKS.index(c.rank) for c in hand if c.suit == trump_suit),
+                default=len(Card.RANKS))
+            for hand in hands
+        ]
+        return 0 if lowest[0] <= lowest[1] else 1
+
+    def _ask(self, player, hand: List[Card], opponent: List[Card], deck: List[Card],
+             table: List[Card], trump_suit: str):
+        player.update_game_state(list(hand), trump_suit, len(opponent), len(deck), self.window_title)
+        return player.get_auto_play_action(list(table))
+
+    def _bout(self, players: Sequence, hands: List[List[Card]], deck: List[Card],
+              attacker: int, defender: int, trump_suit: str) -> bool:
+        """Один заход; True - защитник взял карты"""
+        table: List[Card] = []
+        limit = min(MAX_ATTACK, len(hands[defender]))
+        attack_hand, defend_hand = hands[attacker], hands[defender]
+
+        while len(table) // 2 < limit and attack_hand:
+            action, card = self._ask(players[attacker], attack_hand, defend_hand, deck,
+                                     table, trump_suit)
+            if not table:
+                if action != "attack" or card not in attack_hand:
+                    card = min(attack_hand, key=lambda c: Card.RANKS.index(c.rank))
+            else:
+                ranks = {c.rank for c in table}
+                if action != "add" or card not in attack_hand or card.rank not in ranks:
+                    break
+            attack_hand.remove(card)
+            table.append(card)
+
+            action, card = self._ask(players[defender], defend_hand, attack_hand, deck,
+                                     table, trump_suit)
+            defended = action == "defend" and card in defend_hand
+            if not defended or not card.can_beat(table[-1], trump_suit):
+                defend_hand.extend(table)
+                return True
+            defend_hand.remove(card)
+            table.append(card)
+        return False
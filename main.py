@@ -1,17 +1,27 @@
+import time
+# Отсчет для времени до первого кадра оверлея
+PROCESS_STARTED = time.perf_counter()
+
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
+from kivy.uix.spinner import Spinner
 from kivy.uix.switch import Switch
 from kivy.core.window import Window
 from kivy.clock import Clock
 from game.durak_game import DurakGame
 from ai.durak_ai import DurakAI
-from screen_analyzer.screen_capture import ScreenAnalyzer
-import pyautogui
-import win32gui
-import win32process
-import psutil
+from screen_analyzer.pipeline import AnalysisPipeline
+from screen_analyzer.window_info import get_window_provider
+from perf.metrics import metrics
+import os
+import threading
+
+# OpenCV, NumPy, mss и pyautogui импортируются лениво (см. screen_analyzer и _warm_up):
+# окно появляется до их загрузки
+
+METRICS_FILE = "metrics.json"
 
 class DurakApp(App):
     def build(self):
@@ -21,7 +31,10 @@ class DurakApp(App):
         
         self.game = DurakGame()
         self.ai = DurakAI()
-        self.screen_analyzer = ScreenAnalyzer()
+        self._screen_analyzer = None
+        self._analyzer_lock = threading.Lock()
+        self._region_store = None
+        self.window_provider = get_window_provider()
         
         # Создаем основной layout
         layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
@@ -60,8 +73,17 @@ class DurakApp(App):
         autoplay_box.add_widget(autoplay_label)
         autoplay_box.add_widget(self.autoplay_switch)
         
+        # Переключатель панели производительности
+        perf_box = BoxLayout(orientation='vertical')
+        perf_label = Label(text='Производительность')
+        self.perf_switch = Switch(active=False)
+        self.perf_switch.bind(active=self.on_perf_panel)
+        perf_box.add_widget(perf_label)
+        perf_box.add_widget(self.perf_switch)
+        
         modes.add_widget(aggressive_box)
         modes.add_widget(autoplay_box)
+        modes.add_widget(perf_box)
         
         # Добавляем кнопки управления
         controls = BoxLayout(size_hint_y=0.1)
@@ -84,6 +106,12 @@ class DurakApp(App):
         )
         self.calibrate_button.bind(on_press=self.calibrate)
         
+        self.add_table_button = Button(
+            text='Добавить стол',
+            background_color=(0.2, 0.6, 0.8, 0.8)
+        )
+        self.add_table_button.bind(on_press=self.add_table)
+        
         # Добавляем кнопку для записи результата
         self.result_box = BoxLayout(size_hint_y=0.1)
         self.win_button = Button(
@@ -98,10 +126,15 @@ class DurakApp(App):
         )
         self.lose_button.bind(on_press=lambda x: self.record_game_result(False))
         
+        # Стол, к которому относится результат (список растет в add_table)
+        self.result_table_spinner = Spinner(text='Стол 1', values=['Стол 1'], size_hint_x=0.5)
+        
+        self.result_box.add_widget(self.result_table_spinner)
         self.result_box.add_widget(self.win_button)
         self.result_box.add_widget(self.lose_button)
         
         controls.add_widget(self.calibrate_button)
+        controls.add_widget(self.add_table_button)
         controls.add_widget(self.start_button)
         controls.add_widget(self.stop_button)
         
@@ -118,53 +151,114 @@ class DurakApp(App):
             color=(0, 1, 0, 1)
         )
         
+        # Панель таймингов стадий, видна только при включенном переключателе
+        self.perf_label = Label(
+            text='',
+            size_hint_y=None,
+            height=0,
+            opacity=0,
+            font_size='11sp',
+            color=(1, 1, 0.6, 1)
+        )
+        
         layout.add_widget(self.app_info)
         layout.add_widget(self.stats_label)
         layout.add_widget(modes)
         layout.add_widget(self.status_label)
         layout.add_widget(self.suggestion_label)
+        layout.add_widget(self.perf_label)
         layout.add_widget(controls)
         layout.add_widget(self.result_box)
         
-        self.analysis_event = None
-        self.last_action = None
+        self.analysis_pipeline = None
+        self.scheduler = None
+        # (позиция, действие, карта) последнего предложенного хода - для планировщика
+        self._last_decision = None
+        self.executor = None
+        # DurakAI меняется и из потока конвейера, и из интерфейса
+        self.ai_lock = threading.Lock()
+        
+        # Дополнительные столы (add_table) и их общий обработчик
+        self.extra_tables = []
+        self.table_runner = None
+        self.table_suggestions = {}
+        # Клики разных столов не должны перемежаться
+        self._click_lock = threading.Lock()
+        
+        self.perf_event = None
         
         # Запускаем определение приложения
         Clock.schedule_interval(self.update_app_info, 1.0)
+        # Периодическая выгрузка метрик в ai_data/
+        if metrics.enabled:
+            Clock.schedule_interval(self.export_metrics, 10.0)
         
         return layout
     
+    def on_start(self):
+        Clock.schedule_once(self._on_first_frame, 0)
+    
+    def _on_first_frame(self, dt):
+        """Оверлей отрисован - тяжелые модули догружаются в фоне"""
+        first_frame = time.perf_counter() - PROCESS_STARTED
+        metrics.observe("startup.first_frame", first_frame)
+        if os.environ.get("DURAK_EXIT_AFTER_FIRST_FRAME"):
+            # Используется perf/startup.py --app: время читается из stdout
+            print(f"Первый кадр через {first_frame:.3f} с")
+            self.stop()
+            return
+        threading.Thread(target=self._warm_up, name="warm-up", daemon=True).start()
+    
+    def _warm_up(self):
+        with metrics.timer("startup.warm_up"):
+            self.screen_analyzer
+            import screen_analyzer.scheduler
+            self.ai.value_model
+            self.ai.learning_engine.weights
+            try:
+                import pyautogui
+            except Exception:
+                # Без дисплея pyautogui не загружается; автоигра тогда недоступна
+                pass
+    
+    @property
+    def screen_analyzer(self):
+        """ScreenAnalyzer (OpenCV, mss) создается при первом обращении"""
+        with self._analyzer_lock:
+            if self._screen_analyzer is None:
+                from screen_analyzer.screen_capture import ScreenAnalyzer
+                self._screen_analyzer = ScreenAnalyzer()
+            return self._screen_analyzer
+    
+    @property
+    def region_store(self):
+        """Найденные области игры по приложениям (ai_data/regions.json)"""
+        if self._region_store is None:
+            from screen_analyzer.region_locator import RegionStore
+            self._region_store = RegionStore(self.ai.learning_engine.save_dir)
+        return self._region_store
+    
     def get_active_window_info(self):
         """Получение информации об активном окне"""
-        try:
-            hwnd = win32gui.GetForegroundWindow()
-            _, pid = win32process.GetWindowThreadProcessId(hwnd)
-            process = psutil.Process(pid)
-            window_title = win32gui.GetWindowText(hwnd)
-            return {
-                'pid': pid,
-                'name': process.name(),
-                'title': window_title
-            }
-        except:
-            return None
+        return self.window_provider.get_active_window_info()
     
     def update_app_info(self, dt):
         """Обновление информации о приложении"""
         window_info = self.get_active_window_info()
         if window_info:
             self.app_info.text = f'Приложение: {window_info["name"]} - {window_info["title"]}'
-            # Обновляем информацию в ИИ
-            self.ai.update_game_state(
-                self.game.player_hand,
-                self.game.trump_suit,
-                self.ai.opponent_cards_count,
-                self.ai.deck_remaining,
-                window_info["title"]
-            )
-            
-            # Обновляем статистику
-            stats = self.ai.learning_engine.get_statistics()
+            with self.ai_lock:
+                # Обновляем информацию в ИИ
+                self.ai.update_game_state(
+                    self.game.player_hand,
+                    self.game.trump_suit,
+                    self.ai.opponent_cards_count,
+                    self.ai.deck_remaining,
+                    window_info["title"]
+                )
+                
+                # Обновляем статистику
+                stats = self.ai.learning_engine.get_statistics()
             if stats:
                 self.stats_label.text = (
                     f'Игр: {stats["games_played"]}, '
@@ -173,118 +267,302 @@ class DurakApp(App):
                 )
     
     def record_game_result(self, won: bool):
-        """Запись результата игры"""
-        self.ai.end_game(won)
+        """Запись результата игры на столе, выбранном в result_table_spinner"""
+        spinner = self.result_table_spinner
+        table_index = spinner.values.index(spinner.text) if spinner.text in spinner.values else 0
         result = "победой" if won else "поражением"
-        self.status_label.text = f'Игра завершена с {result}'
-        self.stop_game(None)
+        if table_index == 0:
+            # Анализ останавливается только за одним столом: остальные столы продолжают играть
+            if not self.extra_tables:
+                self.stop_game(None)
+            with self.ai_lock:
+                self.ai.end_game(won)
+            if self.extra_tables:
+                self.status_label.text = f'Игра на столе 1 завершена с {result}'
+            else:
+                self.status_label.text = f'Игра завершена с {result}'
+            return
+        
+        table = self.extra_tables[table_index - 1]
+        with table.lock:
+            table.ai.end_game(won)
+        self.status_label.text = f'Игра на столе {table_index + 1} завершена с {result}'
     
     def on_aggressive_mode(self, instance, value):
-        self.ai.aggressive_mode = value
+        for ai in self._all_ais():
+            ai.aggressive_mode = value
         mode = "агрессивный" if value else "осторожный"
         self.status_label.text = f'Режим игры: {mode}'
     
     def on_auto_play(self, instance, value):
-        self.ai.set_auto_play(value)
+        for ai in self._all_ais():
+            ai.set_auto_play(value)
         mode = "автоматический" if value else "рекомендации"
         self.status_label.text = f'Режим игры: {mode}'
     
+    def _all_ais(self):
+        return [self.ai] + [table.ai for table in self.extra_tables]
+    
+    def on_perf_panel(self, instance, value):
+        if value:
+            self.perf_label.height = 160
+            self.perf_label.opacity = 1
+            self.perf_event = Clock.schedule_interval(self.update_perf_panel, 0.5)
+        else:
+            if self.perf_event:
+                self.perf_event.cancel()
+                self.perf_event = None
+            self.perf_label.height = 0
+            self.perf_label.opacity = 0
+    
+    def update_perf_panel(self, dt):
+        if not metrics.enabled:
+            self.perf_label.text = 'Метрики выключены (DURAK_METRICS=0)'
+            return
+        self.perf_label.text = metrics.format_panel()
+    
+    def export_metrics(self, dt):
+        try:
+            metrics.export(f"{self.ai.learning_engine.save_dir}/{METRICS_FILE}")
+        except OSError:
+            pass
+    
     def calibrate(self, instance):
         self.status_label.text = 'Выполняется калибровка...'
         try:
-            self.screen_analyzer.calibrate_game_region()
+            self.screen_analyzer.calibrate_game_region(
+                self.ai.learning_engine.current_app, self.region_store,
+                self._table_regions(include_primary=False)
+            )
             self.status_label.text = 'Калибровка завершена успешно'
         except Exception as e:
             self.status_label.text = f'Ошибка калибровки: {str(e)}'
     
+    def add_table(self, instance):
+        """Калибровка еще одного стола со своим DurakAI и общим обучением"""
+        if self.table_runner or self.analysis_pipeline:
+            self.status_label.text = 'Остановите анализ перед добавлением стола'
+            return
+        from screen_analyzer.multi_table import TableSession
+        
+        self.status_label.text = 'Выполняется калибровка стола...'
+        try:
+            analyzer = self.screen_analyzer.for_table()
+            # Область не сохраняется: ключ приложения занят первым столом
+            analyzer.calibrate_game_region(exclude=self._table_regions())
+        except Exception as e:
+            self.status_label.text = f'Ошибка калибровки: {str(e)}'
+            return
+        
+        window_info = self.get_active_window_info()
+        ai = DurakAI(self.ai.learning_engine.session())
+        ai.aggressive_mode = self.aggressive_switch.active
+        ai.set_auto_play(self.autoplay_switch.active)
+        ai.trump_suit = self.game.trump_suit
+        table_id = len(self.extra_tables) + 1
+        self.extra_tables.append(TableSession(
+            table_id, analyzer, ai, window_info["title"] if window_info else None
+        ))
+        self.result_table_spinner.values = [f'Стол {i + 1}' for i in range(table_id + 1)]
+        self.status_label.text = f'Добавлен стол {table_id + 1}'
+    
+    def _table_regions(self, include_primary: bool = True):
+        """Области уже настроенных столов (их не найдет повторный автопоиск)"""
+        analyzers = [table.analyzer for table in self.extra_tables]
+        if include_primary:
+            analyzers.append(self.screen_analyzer)
+        return [
+            tuple(a.game_region[k] for k in ("left", "top", "width", "height"))
+            for a in analyzers if a.game_region
+        ]
+    
     def start_game(self, instance):
+        if not self.screen_analyzer.game_region:
+            # Область, найденная для этого приложения раньше, только перепроверяется
+            try:
+                self.screen_analyzer.locate_game_region(
+                    self.ai.learning_engine.current_app, self.region_store
+                )
+            except Exception:
+                pass
         if not self.screen_analyzer.game_region:
             self.status_label.text = 'Сначала выполните калибровку!'
             return
             
+        if self.analysis_pipeline and self.analysis_pipeline.running:
+            return
+        if self.table_runner and self.table_runner.running:
+            return
+        
+        from screen_analyzer.executor import ActionExecutor
+        
+        if self.extra_tables:
+            self._start_tables(ActionExecutor)
+            return
+        
+        from screen_analyzer.scheduler import AdaptiveScheduler
+        
         self.status_label.text = 'Анализ игры запущен'
-        self.analysis_event = Clock.schedule_interval(self.analyze_game_state, 1.0)
+        self.scheduler = AdaptiveScheduler()
+        self._last_decision = None
+        self.executor = ActionExecutor(self.screen_analyzer, self._click)
+        self.analysis_pipeline = AnalysisPipeline(
+            self.screen_analyzer.capture_game_screen,
+            [
+                ("detect", self._detect_stage),
+                ("decide", self._decide_stage),
+                ("act", self._act_stage)
+            ],
+            on_result=lambda result: Clock.schedule_once(lambda dt: self._show_result(result)),
+            on_error=lambda stage, e: Clock.schedule_once(lambda dt: self._show_error(e)),
+            scheduler=self.scheduler
+        )
+        self.analysis_pipeline.start()
+    
+    def _start_tables(self, executor_class):
+        """Несколько столов: каждый шаг стола целиком в пуле потоков MultiTableRunner"""
+        from screen_analyzer.multi_table import MultiTableRunner, TableSession
+        
+        window_info = self.get_active_window_info()
+        self.executor = executor_class(self.screen_analyzer, self._click)
+        primary = TableSession(
+            0, self.screen_analyzer, self.ai,
+            window_info["title"] if window_info else None,
+            executor=self.executor, lock=self.ai_lock
+        )
+        for table in self.extra_tables:
+            table.executor = executor_class(table.analyzer, self._click)
+            table.ai.trump_suit = self.game.trump_suit
+        
+        self.table_suggestions = {}
+        self.table_runner = MultiTableRunner(
+            [primary] + self.extra_tables,
+            on_result=lambda table, result: Clock.schedule_once(
+                lambda dt: self._show_table_result(table, result)),
+            on_error=lambda table, e: Clock.schedule_once(lambda dt: self._show_error(e))
+        )
+        self.status_label.text = f'Анализ {len(self.extra_tables) + 1} столов запущен'
+        self.table_runner.start()
     
     def stop_game(self, instance):
-        if self.analysis_event:
-            self.analysis_event.cancel()
+        if self.analysis_pipeline:
+            self.analysis_pipeline.stop()
+            self.analysis_pipeline = None
+        if self.table_runner:
+            self.table_runner.stop()
+            self.table_runner = None
+            for table in self.extra_tables:
+                if table.executor:
+                    table.executor.reset()
         self.status_label.text = 'Анализ остановлен'
         self.suggestion_label.text = ''
-        self.last_action = None
+        if self.executor:
+            self.executor.reset()
     
-    def analyze_game_state(self, dt):
-        try:
-            # Захват и анализ экрана
-            screen = self.screen_analyzer.capture_game_screen()
-            detected_cards = self.screen_analyzer.detect_cards(screen)
-            
-            # Обновление состояния игры и ИИ
-            player_cards = [card for card, _ in detected_cards]
-            table_cards = self.screen_analyzer.detect_table_cards(screen)
-            opponent_cards = self.screen_analyzer.count_opponent_cards(screen)
-            deck_remaining = self.screen_analyzer.count_deck_cards(screen)
-            
-            # Получаем информацию о текущем приложении
-            window_info = self.get_active_window_info()
-            
-            self.game.player_hand = player_cards
+    def _detect_stage(self, screen):
+        """Распознавание карт на кадре (поток конвейера)"""
+        detection = self.screen_analyzer.analyze_frame(screen)
+        # Кадр нужен исполнителю: цели кликов и проверка хода берутся с него
+        detection["screen"] = screen
+        return detection
+    
+    def _decide_stage(self, detection):
+        """Обновление состояния ИИ и выбор хода (поток конвейера)"""
+        # Получаем информацию о текущем приложении
+        window_info = self.get_active_window_info()
+        
+        with self.ai_lock:
             self.ai.update_game_state(
-                player_cards,
+                detection["player_cards"],
                 self.game.trump_suit,
-                opponent_cards,
-                deck_remaining,
+                detection["opponent_cards"],
+                detection["deck_remaining"],
                 window_info["title"] if window_info else None
             )
-            
-            if self.ai.auto_play:
-                # Режим автоматической игры
-                action, card = self.ai.get_auto_play_action(table_cards)
-                
-                if action != self.last_action:
-                    self.last_action = action
-                    if action == "attack" and card:
-                        self._play_card(card)
-                        self.suggestion_label.text = f'Ход: {card}'
-                    elif action == "defend" and card:
-                        self._play_card(card)
-                        self.suggestion_label.text = f'Отбиваюсь: {card}'
-                    elif action == "add" and card:
-                        self._play_card(card)
-                        self.suggestion_label.text = f'Подкидываю: {card}'
-                    elif action == "take":
-                        self._click_take_button()
-                        self.suggestion_label.text = 'Беру карты'
-                    elif action == "done":
-                        self._click_done_button()
-                        self.suggestion_label.text = 'Бито'
+            # Ход записывается в историю только при новой позиции на столе
+            action, card, _ = self.ai.decide_frame(detection["table_cards"])
+            state = self.ai.last_state
+            auto_play = self.ai.auto_play
+        
+        # Ход за нами, пока есть новое решение: новая позиция или другой ход для той же.
+        # Повтор уже предложенного (и нажатого) хода на следующих кадрах - не повод спешить
+        decision = (state, action, card)
+        self.scheduler.record_decision(decision != self._last_decision)
+        self._last_decision = decision
+        
+        detection.update(action=action, card=card, state=state, auto_play=auto_play)
+        return detection
+    
+    def _act_stage(self, decision):
+        """Выполнение хода в режиме автоигры или текст рекомендации (поток конвейера)"""
+        action, card = decision["action"], decision["card"]
+        
+        if not decision["auto_play"]:
+            # Режим рекомендаций
+            if card:
+                decision["suggestion"] = f'Рекомендую: {action} {card}'
             else:
-                # Режим рекомендаций
-                action, card = self.ai.get_auto_play_action(table_cards)
-                if card:
-                    self.suggestion_label.text = f'Рекомендую: {action} {card}'
-                else:
-                    self.suggestion_label.text = f'Рекомендую: {action}'
-                
-        except Exception as e:
-            self.status_label.text = f'Ошибка анализа: {str(e)}'
+                decision["suggestion"] = f'Рекомендую: {action}'
+            return decision
+        
+        # Режим автоматической игры: клик только после подтверждения предыдущего хода
+        decision["suggestion"] = None
+        if self.executor.process(decision) == "clicked":
+            if action == "attack":
+                decision["suggestion"] = f'Ход: {card}'
+            elif action == "defend":
+                decision["suggestion"] = f'Отбиваюсь: {card}'
+            elif action == "add":
+                decision["suggestion"] = f'Подкидываю: {card}'
+            elif action == "take":
+                decision["suggestion"] = 'Беру карты'
+            elif action == "done":
+                decision["suggestion"] = 'Бито'
+        return decision
+    
+    def _show_result(self, decision):
+        """Вывод результата конвейера (поток интерфейса)"""
+        if not self.analysis_pipeline:
+            return
+        self.game.player_hand = decision["player_cards"]
+        if decision["suggestion"] is not None:
+            self.suggestion_label.text = decision["suggestion"]
+        
+        stats = self.scheduler.stats()
+        self.status_label.text = (
+            f'Анализ: {stats["rate"]:.1f} кадр/с, '
+            f'реакция {stats["latency_ms"]:.0f} мс'
+        )
     
-    def _play_card(self, card):
-        """Находит и кликает по карте на экране"""
-        card_pos = self.screen_analyzer.find_card_position(card)
-        if card_pos:
-            pyautogui.click(card_pos[0], card_pos[1])
+    def _show_table_result(self, table, decision):
+        """Строка рекомендации для каждого стола (поток интерфейса)"""
+        if not self.table_runner:
+            return
+        if table.table_id == 0:
+            self.game.player_hand = decision["player_cards"]
+        
+        action, card = decision["action"], decision["card"]
+        if not decision["auto_play"]:
+            text = f'{action} {card}' if card else action
+        elif decision["act_status"] == "clicked":
+            text = f'выполнено: {action} {card}' if card else f'выполнено: {action}'
+        else:
+            text = self.table_suggestions.get(table.table_id, '')
+        self.table_suggestions[table.table_id] = text
+        self.suggestion_label.text = "\n".join(
+            f'Стол {table_id + 1}: {line}'
+            for table_id, line in sorted(self.table_suggestions.items())
+        )
     
-    def _click_take_button(self):
-        """Находит и кликает по кнопке 'Взять'"""
-        take_pos = self.screen_analyzer.find_take_button()
-        if take_pos:
-            pyautogui.click(take_pos[0], take_pos[1])
+    def _show_error(self, error):
+        if not self.analysis_pipeline and not self.table_runner:
+            return
+        self.status_label.text = f'Ошибка анализа: {str(error)}'
     
-    def _click_done_button(self):
-        """Находит и кликает по кнопке 'Бито'"""
-        done_pos = self.screen_analyzer.find_done_button()
-        if done_pos:
-            pyautogui.click(done_pos[0], done_pos[1])
+    def _click(self, pos):
+        import pyautogui
+        with self._click_lock, metrics.timer("act.click"):
+            pyautogui.click(pos[0], pos[1])
 
 if __name__ == '__main__':
     DurakApp().run() 
\ No newline at end of file
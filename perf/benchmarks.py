@@ -0,0 +1,294 @@
+"""Бенчмарки решений и обучения (без распознавания экрана) с проверкой по сохраненным базовым значениям.
+
+    python -m perf.benchmarks                     # таблица и сравнение с perf/baselines.json
+    python -m perf.benchmarks --json              # для CI и сравнения между версиями
+    python -m perf.benchmarks --update-baseline   # записать текущие значения как базовые
+
+Код выхода 1, если хотя бы один замер хуже базового больше чем на допуск.
+Замеры с записью файлов (learn.*, save.*) шумнее остальных, у них допуск не меньше IO_TOLERANCE.
+Базовые значения зависят от машины - их нужно записывать на той же, где идет проверка.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+from ai.durak_ai import DurakAI
+from ai.learning_engine import LearningEngine, GameAction, GameResult, GameState
+from game.durak_game import Card
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+DEFAULT_TOLERANCE = 0.5
+# Допуск замеров, время которых в основном - запись файлов в миллисекундах
+IO_TOLERANCE = 1.5
+REPEAT = 9
+BENCH_APP = "Benchmark"
+
+PREFERRED_MOVES_SIZES = (1000, 10000, 100000)
+HISTORY_SIZES = (10, 100, 1000)
+
+
+def _median_of(repeat: int, func: Callable[[], None],
+               setup: Optional[Callable[[], None]] = None) -> float:
+    """Медиана времени repeat запусков; setup перед каждым запуском в замер не входит"""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def _result(value: float, unit: str, higher_is_better: bool,
+            tolerance: Optional[float] = None) -> Dict:
+    result = {"value": round(value, 6), "unit": unit, "higher_is_better": higher_is_better}
+    if tolerance is not None:
+        result["tolerance"] = tolerance
+    return result
+
+
+def random_position(rng: random.Random) -> Dict:
+    """Случайная позиция: рука, стол (атака/защита), козырь, счетчики"""
+    deck = list(Card.from_index(i) for i in range(Card.DECK_SIZE))
+    rng.shuffle(deck)
+    hand_size = rng.randint(1, 6)
+    table_size = rng.randint(0, 4)
+    return {
+        "hand": deck[:hand_size],
+        "table": deck[hand_size:hand_size + table_size],
+        "trump": rng.choice(Card.SUITS),
+        "opponent_cards": rng.randint(0, 6),
+        "deck_remaining": rng.randint(0, 24)
+    }
+
+
+def random_history(rng: random.Random, size: int) -> List:
+    history = []
+    for _ in range(size):
+        position = random_position(rng)
+        state = GameState(position["hand"], position["table"], position["trump"],
+                          position["opponent_cards"], position["deck_remaining"])
+        action = GameAction(rng.choice(GameAction.TYPES), rng.choice(position["hand"]))
+        history.append((state, action, rng.uniform(-1.0, 1.0)))
+    return history
+
+
+def random_moves(rng: random.Random, size: int) -> Dict[str, Dict]:
+    """preferred_moves приложения из size ходов"""
+    moves = {}
+    for i in range(size):
+        count = rng.randint(1, 50)
+        moves[f"{rng.choice(GameAction.TYPES)}_{i}"] = {
+            "count": count, "success": rng.uniform(-0.5, 1.0) * count
+        }
+    return moves
+
+
+def bench_decisions(save_dir: str, seed: int, count: int) -> Dict[str, Dict]:
+    """DurakAI.get_auto_play_action на count разных позициях (кэш решений сбрасывается)"""
+    rng = random.Random(seed)
+    positions = [random_position(rng) for _ in range(count)]
+    ai = DurakAI(LearningEngine(save_dir))
+    # Эвристика, а не обученная модель из ai_data - замер не зависит от установки
+    ai.value_model = None
+
+    def run():
+        ai._decision_cache.clear()
+        ai.last_state = ai.last_action = None
+        ai.learning_engine.game_history.clear()
+        for position in positions:
+            ai.update_game_state(position["hand"], position["trump"], position["opponent_cards"],
+                                 position["deck_remaining"], BENCH_APP)
+            ai.get_auto_play_action(position["table"])
+
+    elapsed = _median_of(REPEAT, run)
+    return {"decide.decisions_per_sec": _result(count / elapsed, "1/s", True)}
+
+
+def bench_strategy_adjustments(save_dir: str, seed: int,
+                               sizes=PREFERRED_MOVES_SIZES) -> Dict[str, Dict]:
+    """get_strategy_adjustments при росте preferred_moves"""
+    rng = random.Random(seed)
+    engine = LearningEngine(save_dir)
+    engine.detect_current_app(BENCH_APP)
+    app_stats = engine.app_specific_strategies.get(engine.current_app)
+    app_stats["games_played"] = 10
+    app_stats["success_rate"] = 0.5
+
+    results = {}
+    for size in sizes:
+        app_stats["preferred_moves"] = random_moves(rng, size)
+        calls = max(1, 100000 // size)
+
+        def run():
+            for _ in range(calls):
+                engine.get_strategy_adjustments()
+
+        elapsed = _median_of(REPEAT, run)
+        results[f"adjustments.latency_ms.{size}"] = _result(1000 * elapsed / calls, "ms", False)
+    return results
+
+
+def bench_learning(save_dir: str, seed: int, sizes=HISTORY_SIZES) -> Dict[str, Dict]:
+    """learn_from_game (веса, паттерны, запись файлов) от длины партии"""
+    rng = random.Random(seed)
+    results = {}
+    for size in sizes:
+        history = random_history(rng, size)
+        engines = []
+
+        def setup():
+            # Каждый запуск - в новом каталоге: журнал партий и файлы не растут от повторов
+            engine = LearningEngine(os.path.join(save_dir, f"learn_{size}_{len(engines)}"))
+            engine.detect_current_app(BENCH_APP)
+            engine.game_history = list(history)
+            engines.append(engine)
+
+        def run():
+            engines[-1].learn_from_game(GameResult(True, size))
+
+        elapsed = _median_of(REPEAT, run, setup)
+        results[f"learn.latency_ms.{size}"] = _result(1000 * elapsed, "ms", False, IO_TOLERANCE)
+    return results
+
+
+def bench_save(save_dir: str, seed: int, sizes=PREFERRED_MOVES_SIZES) -> Dict[str, Dict]:
+    """_save_data при росте preferred_moves приложения - основной объем записи"""
+    rng = random.Random(seed)
+    results = {}
+    for size in sizes:
+        moves = random_moves(rng, size)
+        engines = []
+
+        def setup():
+            # Каждый запуск пишет в новый каталог
+            engine = LearningEngine(os.path.join(save_dir, f"save_{size}_{len(engines)}"))
+            engine.detect_current_app(BENCH_APP)
+            app_stats = engine.app_specific_strategies.get(engine.current_app)
+            app_stats["games_played"] = 10
+            app_stats["preferred_moves"] = moves
+            # _save_data записывает только измененные приложения
+            engine.app_specific_strategies.mark_dirty(engine.current_app)
+            engines.append(engine)
+
+        def run():
+            engines[-1]._save_data()
+
+        elapsed = _median_of(REPEAT, run, setup)
+        results[f"save.latency_ms.{size}"] = _result(1000 * elapsed, "ms", False, IO_TOLERANCE)
+    return results
+
+
+def bench_can_beat(seed: int, count: int) -> Dict[str, Dict]:
+    rng = random.Random(seed)
+    cards = [Card.from_index(i) for i in range(Card.DECK_SIZE)]
+    pairs = [(rng.choice(cards), rng.choice(cards), rng.choice(Card.SUITS)) for _ in range(count)]
+
+    def run():
+        for attacker, defender, trump in pairs:
+            defender.can_beat(attacker, trump)
+
+    elapsed = _median_of(REPEAT, run)
+    return {"can_beat.ops_per_sec": _result(count / elapsed, "1/s", True)}
+
+
+def run_all(seed: int = 0, quick: bool = False) -> Dict[str, Dict]:
+    scale = 10 if quick else 1
+    results = {}
+    with tempfile.TemporaryDirectory() as save_dir:
+        results.update(bench_decisions(os.path.join(save_dir, "decide"), seed, 20000 // scale))
+        results.update(bench_strategy_adjustments(
+            os.path.join(save_dir, "adjust"), seed,
+            PREFERRED_MOVES_SIZES[:-1] if quick else PREFERRED_MOVES_SIZES
+        ))
+        results.update(bench_learning(save_dir, seed))
+        results.update(bench_save(
+            os.path.join(save_dir, "save"), seed,
+            PREFERRED_MOVES_SIZES[:-1] if quick else PREFERRED_MOVES_SIZES
+        ))
+        results.update(bench_can_beat(seed, 200000 // scale))
+    return results
+
+
+def compare(results: Dict[str, Dict], baselines: Dict[str, Dict], tolerance: float) -> List[str]:
+    """Замеры, ухудшившиеся относительно базовых больше чем на tolerance"""
+    regressions = []
+    for name, result in results.items():
+        base = baselines.get(name)
+        if not base:
+            continue
+        allowed = max(tolerance, result.get("tolerance", tolerance))
+        if result["higher_is_better"]:
+            worse = result["value"] < base["value"] * (1 - allowed)
+        else:
+            worse = result["value"] > base["value"] * (1 + allowed)
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def load_baselines(path: str) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки решений и обучения")
+    parser.add_argument("--json", action="store_true", help="вывод в JSON")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quick", action="store_true", help="меньшие объемы (без 10^5 ходов)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="файл базовых значений")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help=f"допустимое ухудшение (по умолчанию из файла или {DEFAULT_TOLERANCE})")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="записать результаты как базовые вместо сравнения")
+    args = parser.parse_args(argv)
+
+    results = run_all(args.seed, args.quick)
+
+    if args.update_baseline:
+        data = {
+            "tolerance": args.tolerance if args.tolerance is not None else DEFAULT_TOLERANCE,
+            "seed": args.seed,
+            "results": results
+        }
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+
+    baseline = None if args.update_baseline else load_baselines(args.baseline)
+    tolerance = args.tolerance
+    if tolerance is None:
+        tolerance = baseline.get("tolerance", DEFAULT_TOLERANCE) if baseline else DEFAULT_TOLERANCE
+    base_results = baseline["results"] if baseline else {}
+    regressions = compare(results, base_results, tolerance)
+
+    if args.json:
+        print(json.dumps({"seed": args.seed, "tolerance": tolerance, "results": results,
+                          "regressions": regressions}, ensure_ascii=False, indent=2))
+    else:
+        for name, result in results.items():
+            base = base_results.get(name)
+            line = f"  {name:<32} {result['value']:14.3f} {result['unit']:<4}"
+            if base:
+                line += f"  (базовое {base['value']:.3f}{', РЕГРЕССИЯ' if name in regressions else ''})"
+            print(line)
+        if baseline is None and not args.update_baseline:
+            print(f"Базовые значения не найдены: {args.baseline}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Легковесные метрики: таймеры стадий с перцентилями и счетчики.
+
+Общий экземпляр metrics включен по умолчанию; DURAK_METRICS=0 выключает
+его, и тогда timer() возвращает один и тот же пустой контекст-менеджер.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("_metrics", "_name", "_started")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._metrics.observe(self._name, time.perf_counter() - self._started)
+        return False
+
+
+class Metrics:
+    def __init__(self, enabled: bool = True, window: int = 512):
+        self.enabled = enabled
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._totals: Dict[str, int] = {}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def timer(self, name: str):
+        """with metrics.timer("stage"): ... - время в скользящее окно стадии"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def observe(self, name: str, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+            samples.append(seconds)
+            self._totals[name] = self._totals.get(name, 0) + 1
+
+    def incr(self, name: str, amount: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> Dict:
+        """p50/p95/p99 по последним window замерам каждой стадии и значения счетчиков"""
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+            totals = dict(self._totals)
+            counters = dict(self._counters)
+
+        timers = {}
+        for name, values in samples.items():
+            if not values:
+                continue
+            n = len(values)
+            timers[name] = {
+                "count": totals[name],
+                "mean_ms": 1000 * sum(values) / n,
+                "p50_ms": 1000 * values[min(n - 1, int(0.50 * n))],
+                "p95_ms": 1000 * values[min(n - 1, int(0.95 * n))],
+                "p99_ms": 1000 * values[min(n - 1, int(0.99 * n))]
+            }
+        return {"timers": timers, "counters": counters}
+
+    def format_panel(self) -> str:
+        """Короткий текст для панели в оверлее"""
+        snapshot = self.snapshot()
+        lines = [
+            f'{name}: p50 {t["p50_ms"]:.1f} / p95 {t["p95_ms"]:.1f} / p99 {t["p99_ms"]:.1f} мс'
+            for name, t in sorted(snapshot["timers"].items())
+        ]
+        if snapshot["counters"]:
+            lines.append(", ".join(f"{k}={v}" for k, v in sorted(snapshot["counters"].items())))
+        return "\n".join(lines)
+
+    def export(self, path: str):
+        data = self.snapshot()
+        data["timestamp"] = datetime.now().isoformat()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+metrics = Metrics(enabled=os.environ.get("DURAK_METRICS", "1") != "0")
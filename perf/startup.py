@@ -0,0 +1,116 @@
+"""Замер времени запуска: импорт каждого модуля и инициализация подсистем в чистом процессе.
+
+    python -m perf.startup            # таблица
+    python -m perf.startup --json     # для сравнения между версиями
+    python -m perf.startup --app      # еще и время до первого кадра оверлея (нужен дисплей)
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORTS = [
+    "kivy",
+    "numpy",
+    "cv2",
+    "mss",
+    "psutil",
+    "pyautogui",
+    "ai.learning_engine",
+    "ai.durak_ai",
+    "ai.value_model",
+    "screen_analyzer.window_info",
+    "screen_analyzer.screen_capture",
+    "main"
+]
+
+# Название -> (код подготовки, замеряемый код)
+INITS = {
+    "LearningEngine()": ("from ai.learning_engine import LearningEngine",
+                         "LearningEngine()"),
+    "LearningEngine.weights": ("from ai.learning_engine import LearningEngine\nengine = LearningEngine()",
+                               "engine.weights"),
+    "DurakAI()": ("from ai.durak_ai import DurakAI", "DurakAI()"),
+    "DurakAI.value_model": ("from ai.durak_ai import DurakAI\nai = DurakAI()", "ai.value_model"),
+    "ScreenAnalyzer()": ("from screen_analyzer.screen_capture import ScreenAnalyzer",
+                         "ScreenAnalyzer()"),
+    "window provider": ("from screen_analyzer.window_info import get_window_provider\n"
+                        "provider = get_window_provider()",
+                        "provider.get_active_window_info()")
+}
+
+_PROBE = """
+import json, sys, time
+{setup}
+started = time.perf_counter()
+{measured}
+print(json.dumps({{"seconds": time.perf_counter() - started}}))
+"""
+
+
+def _run_probe(setup: str, measured: str) -> Dict:
+    """Выполнение кода в новом интерпретаторе, чтобы не мешали уже загруженные модули"""
+    code = _PROBE.format(setup=setup, measured=measured)
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"код {result.returncode}"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure_imports(modules: List[str]) -> Dict[str, Dict]:
+    return {module: _run_probe("", f"import {module}") for module in modules}
+
+
+def measure_inits() -> Dict[str, Dict]:
+    return {name: _run_probe(setup, measured) for name, (setup, measured) in INITS.items()}
+
+
+def measure_first_frame() -> Optional[Dict]:
+    """Запуск main.py до первого кадра (DurakApp завершается сам)"""
+    env = dict(os.environ, DURAK_EXIT_AFTER_FIRST_FRAME="1")
+    result = subprocess.run([sys.executable, "main.py"], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=120)
+    for line in result.stdout.splitlines():
+        if line.startswith("Первый кадр через"):
+            return {"seconds": float(line.split()[3])}
+    lines = result.stderr.strip().splitlines()
+    return {"error": lines[-1] if lines else f"код {result.returncode}"}
+
+
+def _format(name: str, entry: Dict) -> str:
+    if "error" in entry:
+        return f"  {name:<34} -- {entry['error']}"
+    return f"  {name:<34} {1000 * entry['seconds']:9.1f} мс"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер времени импорта и инициализации")
+    parser.add_argument("--json", action="store_true", help="вывод в JSON")
+    parser.add_argument("--app", action="store_true", help="замерить время до первого кадра main.py")
+    args = parser.parse_args(argv)
+
+    report = {"imports": measure_imports(IMPORTS), "init": measure_inits()}
+    if args.app:
+        report["first_frame"] = measure_first_frame()
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print("Импорт (каждый модуль в новом процессе, с зависимостями):")
+    for name, entry in report["imports"].items():
+        print(_format(name, entry))
+    print("Инициализация:")
+    for name, entry in report["init"].items():
+        print(_format(name, entry))
+    if "first_frame" in report:
+        print(_format("Первый кадр оверлея", report["first_frame"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Пакетный анализ снимков экрана без интерфейса.
+
+Результат - JSON Lines, по строке на снимок:
+    python -m screen_analyzer.batch --input captures/ --region 100,80,1280,720 --workers 8 --data-dir ai_data
+    find captures -name '*.png' | python -m screen_analyzer.batch --input - > results.jsonl
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+from typing import Dict, Iterator, Optional, Tuple
+
+import cv2
+
+from ai.durak_ai import DurakAI
+from ai.learning_engine import LearningEngine
+from .screen_capture import ScreenAnalyzer
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+# Состояние процесса-воркера (заполняется в _init_worker)
+_analyzer: Optional[ScreenAnalyzer] = None
+_ai: Optional[DurakAI] = None
+
+
+def parse_region(text: str) -> Tuple[int, int, int, int]:
+    """"left,top,width,height" -> кортеж"""
+    parts = [int(p) for p in text.split(",")]
+    if len(parts) != 4 or parts[2] <= 0 or parts[3] <= 0:
+        raise argparse.ArgumentTypeError("ожидается left,top,width,height")
+    return tuple(parts)
+
+
+def parse_suit(text: str) -> str:
+    suit = ScreenAnalyzer.SUIT_NAMES.get(text.lower(), text)
+    if suit not in ScreenAnalyzer.SUIT_NAMES.values():
+        raise argparse.ArgumentTypeError(f"неизвестная масть: {text}")
+    return suit
+
+
+def iter_inputs(source: str) -> Iterator[str]:
+    """Файлы каталога по порядку или пути из stdin по мере поступления"""
+    if source == "-":
+        for line in sys.stdin:
+            path = line.strip()
+            if path:
+                yield path
+        return
+    if os.path.isdir(source):
+        for path in sorted(glob.glob(os.path.join(source, "**", "*"), recursive=True)):
+            if path.lower().endswith(IMAGE_EXTENSIONS):
+                yield path
+        return
+    yield source
+
+
+def _init_worker(region: Optional[Tuple[int, int, int, int]], trump_suit: Optional[str],
+                 data_dir: str):
+    global _analyzer, _ai
+    _analyzer = ScreenAnalyzer()
+    if region:
+        _analyzer.set_game_region(*region)
+    # Веса, параметры и модель ценности - из явно указанного каталога, а не из текущего
+    _ai = DurakAI(LearningEngine(data_dir))
+    _ai.trump_suit = trump_suit
+
+
+def analyze_screenshot(path: str) -> Dict:
+    """Распознавание и рекомендация для одного снимка"""
+    started = time.perf_counter()
+    record = {"file": path}
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None:
+        record["error"] = "не удалось прочитать изображение"
+        return record
+
+    try:
+        detection = _analyzer.analyze_frame(_analyzer.crop_to_region(image))
+        _ai.update_game_state(
+            detection["player_cards"],
+            _ai.trump_suit,
+            detection["opponent_cards"],
+            detection["deck_remaining"]
+        )
+        action, card = _ai.recommend(detection["table_cards"])
+    except Exception as e:
+        record["error"] = str(e)
+        return record
+
+    record.update(
+        hand=[str(c) for c in detection["player_cards"]],
+        table=[str(c) for c in detection["table_cards"]],
+        opponent_cards=detection["opponent_cards"],
+        deck_remaining=detection["deck_remaining"],
+        action=action,
+        card=str(card) if card else None,
+        elapsed_ms=round(1000 * (time.perf_counter() - started), 2)
+    )
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетный анализ снимков экрана (JSON Lines)")
+    parser.add_argument("--input", required=True, help="каталог, файл или '-' для списка путей из stdin")
+    parser.add_argument("--output", default="-", help="файл результатов (по умолчанию stdout)")
+    parser.add_argument("--region", type=parse_region, default=None,
+                        help="область игры left,top,width,height (по умолчанию весь снимок)")
+    parser.add_argument("--trump", type=parse_suit, default=None, help="козырь: ♥ или hearts")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunksize", type=int, default=8)
+    parser.add_argument("--data-dir", default="ai_data",
+                        help="каталог обучения ИИ (weights.json, params.json, value_model.npz)")
+    args = parser.parse_args(argv)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    started = time.perf_counter()
+    count = 0
+    try:
+        with Pool(max(1, args.workers), initializer=_init_worker,
+                  initargs=(args.region, args.trump, args.data_dir)) as pool:
+            for record in pool.imap(analyze_screenshot, iter_inputs(args.input), args.chunksize):
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"Обработано снимков: {count} за {elapsed:.2f} с ({rate:.1f}/с)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
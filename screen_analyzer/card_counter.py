@@ -0,0 +1,194 @@
+"""Подсчет карт противника и колоды по контурам на небольшой области и чтение счетчиков-цифр."""
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+import cv2
+import numpy as np
+
+from perf.metrics import metrics
+
+# Отношение высоты карты к ширине
+CARD_ASPECT = 1.45
+
+
+class RoiCache:
+    """Результаты по содержимому области: одинаковый кадр не пересчитывается.
+
+    Ключ - хэш прореженных пикселей области (каждый 4-й по обеим осям) и ее размер.
+    """
+
+    def __init__(self, size: int = 128):
+        self.size = size
+        self._items: "OrderedDict[tuple, object]" = OrderedDict()
+
+    @staticmethod
+    def key(roi: np.ndarray) -> tuple:
+        return roi.shape, hash(np.ascontiguousarray(roi[::4, ::4]).tobytes())
+
+    def get(self, roi: np.ndarray, compute: Callable[[np.ndarray], object]):
+        key = self.key(roi)
+        if key in self._items:
+            self._items.move_to_end(key)
+            metrics.incr("count.cache_hit")
+            return self._items[key]
+        value = compute(roi)
+        self._items[key] = value
+        if len(self._items) > self.size:
+            self._items.popitem(last=False)
+        return value
+
+
+class CardCounter:
+    """Количество карт (рубашек) в области.
+
+    Все, что заметно отличается по цвету от фона (медиана рамки области),
+    делится на связные компоненты по уменьшенной копии области. Компонента
+    шириной в одну карту - одна карта. В веере карты перекрываются, и
+    каждая видна только левой границей: такие границы ищутся в полном
+    разрешении по нескольким строкам компоненты как столбцы, где перепад
+    яркости есть почти во всех строках. Карт столько, сколько границ левее
+    правой, целиком видимой карты.
+    """
+
+    def __init__(self, card_width: Optional[int] = None, max_side: int = 320,
+                 color_threshold: float = 60.0, edge_threshold: int = 40,
+                 edge_fill: float = 0.7, sample_rows: int = 16, cache_size: int = 128):
+        # Ширина карты на кадре; если не задана - оценивается по высоте компоненты
+        self.card_width = card_width
+        self.max_side = max_side
+        self.color_threshold = color_threshold
+        self.edge_threshold = edge_threshold
+        self.edge_fill = edge_fill
+        self.sample_rows = sample_rows
+        self.cache = RoiCache(cache_size)
+
+    def count(self, roi: np.ndarray) -> int:
+        if roi.size == 0:
+            return 0
+        with metrics.timer("count.cards"):
+            return self.cache.get(roi, self._count)
+
+    def _count(self, roi: np.ndarray) -> int:
+        image = roi[:, :, :3] if roi.ndim == 3 else cv2.cvtColor(roi, cv2.COLOR_GRAY2BGR)
+        # Прореживание вместо resize: для поиска компонент точность в step пикселей достаточна
+        step = -(-max(image.shape[:2]) // self.max_side)
+        small = np.ascontiguousarray(image[::step, ::step])
+        scale = 1.0 / step
+
+        count, _, stats, _ = cv2.connectedComponentsWithStats(self._foreground(small))
+        min_height = 0.25 * min(small.shape[:2])
+        total = 0
+        for x, y, w, h, area in stats[1:count]:
+            # Мелкие пятна и полосы интерфейса - не карты
+            if h < min_height or area < 0.5 * h * min(w, h / CARD_ASPECT):
+                continue
+            # Рамка компоненты в координатах исходной области
+            x0, y0 = int(x / scale), int(y / scale)
+            x1, y1 = int((x + w) / scale), int((y + h) / scale)
+            card_width = self.card_width or (y1 - y0) / CARD_ASPECT
+            total += self._count_blob(image, x0, y0, x1, y1, card_width)
+        return total
+
+    def _foreground(self, image: np.ndarray) -> np.ndarray:
+        border = np.concatenate([image[0], image[-1], image[:, 0], image[:, -1]])
+        background = np.empty_like(image)
+        background[:] = np.median(border, axis=0).astype(np.uint8)
+        # Сумма разностей по каналам
+        distance = cv2.transform(cv2.absdiff(image, background), np.ones((1, 3), np.float32))
+        mask = (distance > self.color_threshold).astype(np.uint8)
+        return cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+
+    def _count_blob(self, image: np.ndarray, x0: int, y0: int, x1: int, y1: int,
+                    card_width: float) -> int:
+        if x1 - x0 <= 1.12 * card_width:
+            return 1
+
+        # Несколько строк из середины компоненты с запасом по краям
+        rows = np.linspace(y0 + 0.15 * (y1 - y0), y0 + 0.85 * (y1 - y0), self.sample_rows)
+        left, right = max(0, x0 - 4), min(image.shape[1], x1 + 4)
+        strip = image[rows.astype(int), left:right]
+        gray = cv2.cvtColor(np.ascontiguousarray(strip), cv2.COLOR_BGR2GRAY).astype(np.int16)
+        jumps = np.abs(np.diff(gray, axis=1)) > self.edge_threshold
+        columns = np.flatnonzero(jumps.mean(axis=0) >= self.edge_fill) + left
+
+        # Соседние столбцы (обе стороны светлой рамки карты) - одна граница
+        edges = []
+        for column in columns:
+            if edges and column - edges[-1][1] <= 4:
+                edges[-1][1] = column
+            else:
+                edges.append([column, column])
+
+        last_left = x1 - card_width
+        cards = sum(1 for start, _ in edges if start <= last_left + 0.25 * card_width)
+        return max(1, cards)
+
+
+class DigitReader:
+    """Число на экранном счетчике (например, остаток колоды).
+
+    По шаблонам цифр {"0": изображение, ...}; без шаблонов - через
+    pytesseract, только если use_tesseract (запуск tesseract - порядка
+    100 мс на кадр). None - если число прочитать не удалось.
+    """
+
+    def __init__(self, templates: Optional[Dict[str, np.ndarray]] = None,
+                 threshold: float = 0.8, cache_size: int = 128, use_tesseract: bool = False):
+        self.templates = templates or {}
+        self.threshold = threshold
+        self.use_tesseract = use_tesseract
+        self.cache = RoiCache(cache_size)
+        self._tesseract = None
+        self._tesseract_checked = False
+
+    @property
+    def available(self) -> bool:
+        return bool(self.templates) or (self.use_tesseract and self.tesseract is not None)
+
+    @property
+    def tesseract(self):
+        """pytesseract - необязательная зависимость, загружается при первом обращении"""
+        if not self._tesseract_checked:
+            try:
+                import pytesseract
+                self._tesseract = pytesseract
+            except ImportError:
+                self._tesseract = None
+            self._tesseract_checked = True
+        return self._tesseract
+
+    def read(self, roi: np.ndarray) -> Optional[int]:
+        if roi.size == 0 or not self.available:
+            return None
+        with metrics.timer("count.digits"):
+            return self.cache.get(roi, self._read)
+
+    def _read(self, roi: np.ndarray) -> Optional[int]:
+        gray = roi if roi.ndim == 2 else cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+        if not self.templates:
+            try:
+                text = self.tesseract.image_to_string(
+                    gray, config="--psm 7 -c tessedit_char_whitelist=0123456789"
+                ).strip()
+            except OSError:
+                # Пакет есть, а программы tesseract нет - больше не пробуем
+                self._tesseract = None
+                return None
+            return int(text) if text.isdigit() else None
+
+        hits = []
+        for digit, template in self.templates.items():
+            if template.shape[0] > gray.shape[0] or template.shape[1] > gray.shape[1]:
+                continue
+            result = cv2.matchTemplate(gray, template, cv2.TM_CCOEFF_NORMED)
+            for px, py in zip(*np.where(result >= self.threshold)[::-1]):
+                hits.append((float(result[py, px]), int(px), digit, template.shape[1]))
+
+        # Из перекрывающихся совпадений остается лучшее
+        chosen = []
+        for score, px, digit, width in sorted(hits, reverse=True):
+            if all(abs(px - other) >= width // 2 for other, _ in chosen):
+                chosen.append((px, digit))
+        if not chosen:
+            return None
+        return int("".join(digit for _, digit in sorted(chosen)))
@@ -0,0 +1,139 @@
+"""Выполнение ходов автоигры с проверкой по следующим кадрам."""
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from perf.metrics import metrics
+
+# Ходы, для которых нужен клик
+CLICK_ACTIONS = ("attack", "defend", "add", "take", "done")
+
+
+class ActionExecutor:
+    """Очередь ходов: клик, проверка изменения под точкой клика, повтор или отказ.
+
+    Точка клика берется из того кадра, по которому принято решение (карты
+    руки - из его распознавания, кнопки ищутся на нем же). Следующий ход
+    не выполняется, пока предыдущий не подтвержден изменением области
+    вокруг точки клика или не истек latency_budget. Решения по кадрам с
+    тем же состоянием стола, что и при последнем клике, считаются
+    устаревшими - так одинаковые ходы подряд (два "add") различаются по
+    состоянию, а не по названию действия.
+    """
+
+    def __init__(self, analyzer, click: Callable[[Tuple[int, int]], None],
+                 latency_budget: float = 1.5, retry_after: float = 0.4,
+                 max_attempts: int = 3, patch_size: Tuple[int, int] = (60, 80),
+                 change_threshold: float = 12.0):
+        self.analyzer = analyzer
+        self.click = click
+        self.latency_budget = latency_budget
+        self.retry_after = retry_after
+        self.max_attempts = max_attempts
+        self.patch_size = patch_size
+        self.change_threshold = change_threshold
+
+        self.pending: Optional[Dict] = None
+        self.queued: Optional[Dict] = None
+        self.last_state = None
+
+    def reset(self):
+        self.pending = None
+        self.queued = None
+        self.last_state = None
+
+    def _patch(self, screen: np.ndarray, pos: Tuple[int, int]) -> np.ndarray:
+        half_w, half_h = self.patch_size[0] // 2, self.patch_size[1] // 2
+        x, y = pos
+        patch = screen[max(0, y - half_h):y + half_h, max(0, x - half_w):x + half_w]
+        return patch.astype(np.int16)
+
+    def _changed(self, screen: np.ndarray) -> bool:
+        before = self.pending["patch"]
+        after = self._patch(screen, self.pending["target"])
+        if before.shape != after.shape or before.size == 0:
+            return True
+        return float(np.abs(after - before).mean()) > self.change_threshold
+
+    def process(self, decision: Dict) -> str:
+        """Обработка решения по очередному кадру.
+
+        decision: action, card, state (GameState), screen (кадр) и
+        результат ScreenAnalyzer.analyze_frame. Возвращает статус:
+        clicked, verified, retried, aborted, waiting, stale, no_target, idle.
+        """
+        if decision["action"] in CLICK_ACTIONS:
+            self.queued = decision
+
+        if self.pending:
+            status = self._verify(decision)
+            if self.pending:
+                return status
+            if status == "aborted":
+                return status
+
+        decision = self.queued
+        self.queued = None
+        if decision is None:
+            return "idle"
+        if decision["state"] is not None and decision["state"] == self.last_state:
+            metrics.incr("act.stale")
+            return "stale"
+        return self._execute(decision)
+
+    def _execute(self, decision: Dict) -> str:
+        screen = decision["screen"]
+        target = self.analyzer.resolve_click_target(
+            decision["action"], decision["card"], screen, decision
+        )
+        if target is None:
+            metrics.incr("act.no_target")
+            return "no_target"
+
+        now = time.monotonic()
+        self.pending = {
+            "decision": decision,
+            "target": target,
+            "patch": self._patch(screen, target),
+            "started": now,
+            "clicked": now,
+            "attempts": 1
+        }
+        self.last_state = decision["state"]
+        self.click(self.analyzer.to_screen_coords(target))
+        metrics.incr("act.clicked")
+        return "clicked"
+
+    def _verify(self, current: Dict) -> str:
+        """Проверка ожидающего хода по кадру current"""
+        pending = self.pending
+        screen = current["screen"]
+        now = time.monotonic()
+        if self._changed(screen):
+            metrics.observe("act.verify", now - pending["started"])
+            metrics.incr("act.verified")
+            self.pending = None
+            return "verified"
+
+        if now - pending["started"] > self.latency_budget or pending["attempts"] >= self.max_attempts:
+            if now - pending["clicked"] >= self.retry_after:
+                metrics.incr("act.aborted")
+                # last_state не сбрасывается: в той же позиции клик не повторяется,
+                # пока стол не изменится
+                self.pending = None
+                return "aborted"
+            return "waiting"
+
+        if now - pending["clicked"] >= self.retry_after:
+            # Цель берется заново с текущего кадра: карта могла сдвинуться
+            decision = pending["decision"]
+            target = self.analyzer.resolve_click_target(
+                decision["action"], decision["card"], screen, current
+            ) or pending["target"]
+            pending.update(target=target, patch=self._patch(screen, target),
+                           clicked=now, attempts=pending["attempts"] + 1)
+            self.click(self.analyzer.to_screen_coords(target))
+            metrics.incr("act.retried")
+            return "retried"
+        return "waiting"
@@ -0,0 +1,131 @@
+"""Одновременный анализ нескольких столов в пуле потоков."""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from perf.metrics import metrics
+
+
+class TableSession:
+    """Один стол: своя область экрана, свой DurakAI и своя лента решений.
+
+    analyzer - ScreenAnalyzer.for_table() (шаблоны общие), ai - DurakAI с
+    LearningEngine.session() общего движка. В каждый момент стол
+    обрабатывается не более чем одним потоком пула.
+    """
+
+    def __init__(self, table_id: int, analyzer, ai, window_title: Optional[str] = None,
+                 executor=None, lock: Optional[threading.Lock] = None, timeline_size: int = 200):
+        self.table_id = table_id
+        self.analyzer = analyzer
+        self.ai = ai
+        self.window_title = window_title
+        self.executor = executor
+        # Нужна, если тот же DurakAI меняется еще и из интерфейса
+        self.lock = lock or threading.Lock()
+        # (время, действие, карта) последних решений
+        self.timeline = deque(maxlen=timeline_size)
+
+    def step(self) -> Dict:
+        """Захват, распознавание, решение и (в автоигре) ход для этого стола"""
+        with metrics.timer(f"table{self.table_id}.step"):
+            screen = self.analyzer.capture_game_screen()
+            detection = self.analyzer.analyze_frame(screen)
+            detection["screen"] = screen
+
+            with self.lock:
+                self.ai.update_game_state(
+                    detection["player_cards"],
+                    self.ai.trump_suit,
+                    detection["opponent_cards"],
+                    detection["deck_remaining"],
+                    self.window_title
+                )
+                # Ход записывается в историю только при новой позиции на столе
+                action, card, _ = self.ai.decide_frame(detection["table_cards"])
+                state = self.ai.last_state
+                auto_play = self.ai.auto_play
+            detection.update(
+                table_id=self.table_id, action=action, card=card,
+                state=state, auto_play=auto_play, act_status=None
+            )
+            if self.executor and auto_play:
+                detection["act_status"] = self.executor.process(detection)
+
+            self.timeline.append((time.time(), action, str(card) if card else None))
+            return detection
+
+
+class MultiTableRunner:
+    """Раздает шаги столов пулу потоков.
+
+    Стол снова ставится в очередь, когда закончен его предыдущий шаг и
+    прошло не меньше interval. Захват и OpenCV отпускают GIL, поэтому при
+    числе потоков до числа столов пропускная способность растет почти
+    линейно с числом ядер.
+    """
+
+    def __init__(self, tables: List[TableSession],
+                 on_result: Callable[[TableSession, Dict], None],
+                 on_error: Optional[Callable[[TableSession, Exception], None]] = None,
+                 workers: Optional[int] = None, interval: float = 0.1):
+        self.tables = tables
+        self.on_result = on_result
+        self.on_error = on_error
+        self.workers = workers or len(tables)
+        self.interval = interval
+        self._in_flight = set()
+        self._last_started: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._dispatcher: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._dispatcher is not None and self._dispatcher.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="table")
+        self._dispatcher = threading.Thread(target=self._dispatch, name="table-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        if self._dispatcher and self._dispatcher is not threading.current_thread():
+            self._dispatcher.join(timeout)
+        self._dispatcher = None
+        if self._pool:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def _dispatch(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for table in self.tables:
+                with self._lock:
+                    if table.table_id in self._in_flight:
+                        continue
+                    if now - self._last_started.get(table.table_id, 0.0) < self.interval:
+                        continue
+                    self._in_flight.add(table.table_id)
+                    self._last_started[table.table_id] = now
+                self._pool.submit(self._run, table)
+            self._stop.wait(self.interval / 4)
+
+    def _run(self, table: TableSession):
+        try:
+            result = table.step()
+        except Exception as e:
+            if self.on_error:
+                self.on_error(table, e)
+        else:
+            self.on_result(table, result)
+        finally:
+            with self._lock:
+                self._in_flight.discard(table.table_id)
@@ -0,0 +1,144 @@
+"""Конвейер анализа в фоновых потоках: захват -> распознавание -> решение -> действие."""
+import queue
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+from perf.metrics import metrics
+
+# Обработчик стадии: принимает результат предыдущей стадии, возвращает свой
+# (None - кадр дальше не передается)
+StageFunc = Callable[[Any], Any]
+
+
+def put_latest(q: queue.Queue, item):
+    """Положить элемент, при переполнении выбросив самый старый"""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+
+class AnalysisPipeline:
+    """Стадии связаны очередями ограниченного размера, каждая работает в своем потоке.
+
+    Если стадия не успевает, в ее очереди остается только самый свежий
+    кадр, старые выбрасываются (счетчик dropped). OpenCV и mss отпускают
+    GIL, поэтому захват и распознавание действительно идут параллельно
+    с интерфейсом. on_result и on_error вызываются из рабочего потока -
+    для Kivy их нужно оборачивать в Clock.schedule_once.
+    """
+
+    def __init__(self, source: Callable[[], Any], stages: List[Tuple[str, StageFunc]],
+                 on_result: Callable[[Any], None],
+                 on_error: Optional[Callable[[str, Exception], None]] = None,
+                 min_interval: float = 0.0, queue_size: int = 1, scheduler=None):
+        self.source = source
+        self.stages = stages
+        self.on_result = on_result
+        self.on_error = on_error
+        self.min_interval = min_interval
+        # AdaptiveScheduler: если задан, пауза между кадрами берется из него
+        self.scheduler = scheduler
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self.dropped = 0
+        self.processed = 0
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def running(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._source_loop, name="pipeline-capture", daemon=True)]
+        for i, (name, _) in enumerate(self.stages):
+            self._threads.append(
+                threading.Thread(target=self._stage_loop, args=(i,), name=f"pipeline-{name}", daemon=True)
+            )
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+        self._threads = []
+        for q in self.queues:
+            while not q.empty():
+                q.get_nowait()
+
+    def _emit(self, index: int, item):
+        q = self.queues[index]
+        if q.full():
+            self.dropped += 1
+            metrics.incr("frames.dropped")
+        put_latest(q, item)
+
+    def _source_loop(self):
+        first = self.queues[0]
+        while not self._stop.is_set():
+            # Не снимаем кадр, пока распознавание не забрало предыдущий
+            if first.full():
+                self._stop.wait(0.005)
+                continue
+            started = time.monotonic()
+            try:
+                with metrics.timer("capture"):
+                    frame = self.source()
+            except Exception as e:
+                self._report("capture", e)
+                # Повторяющаяся ошибка захвата не должна занимать поток целиком
+                self._stop.wait(0.1)
+                frame = None
+            interval = self.min_interval
+            if frame is not None:
+                if self.scheduler:
+                    self.scheduler.observe_frame(frame)
+                    interval = self.scheduler.next_interval()
+                self._emit(0, frame)
+            delay = interval - (time.monotonic() - started)
+            if delay > 0:
+                self._stop.wait(delay)
+
+    def _stage_loop(self, index: int):
+        name, func = self.stages[index]
+        q = self.queues[index]
+        last = index == len(self.stages) - 1
+        while not self._stop.is_set():
+            try:
+                item = q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            started = time.monotonic()
+            try:
+                result = func(item)
+            except Exception as e:
+                self._report(name, e)
+                continue
+            finally:
+                elapsed = time.monotonic() - started
+                metrics.observe(name, elapsed)
+                if self.scheduler:
+                    self.scheduler.record_work(elapsed)
+            if result is None:
+                continue
+            if last:
+                self.processed += 1
+                metrics.incr("frames.processed")
+                self.on_result(result)
+            else:
+                self._emit(index + 1, result)
+
+    def _report(self, stage: str, error: Exception):
+        if self.on_error:
+            self.on_error(stage, error)
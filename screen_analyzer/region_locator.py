@@ -0,0 +1,225 @@
+"""Автоматический поиск игрового поля на снимке экрана и хранение найденных областей по приложениям."""
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from perf.metrics import metrics
+
+REGIONS_FILE = "regions.json"
+
+# Границы полос поля в долях высоты области игры: противник выше top, рука ниже bottom.
+# Колода - у левого или правого края. Используются, пока расположение карт не найдено
+DEFAULT_SPLITS = {"top": 0.25, "bottom": 0.75, "deck_side": "right"}
+
+
+def layout_from_splits(splits: Dict) -> Dict[str, Tuple[float, float, float, float]]:
+    """Зоны руки, стола, противника и колоды (x0, y0, x1, y1) в долях области игры"""
+    top, bottom = splits["top"], splits["bottom"]
+    # Колода - только в средней полосе: карты руки и противника в ее счет не попадают
+    deck = (0.0, top, 0.25, bottom) if splits["deck_side"] == "left" else (0.75, top, 1.0, bottom)
+    return {
+        "hand": (0.0, bottom, 1.0, 1.0),
+        "table": (0.25, top, 0.75, bottom),
+        "opponent": (0.0, 0.0, 1.0, top),
+        "deck": deck
+    }
+
+
+Region = Tuple[int, int, int, int]  # left, top, width, height
+
+
+def _bgr(image: np.ndarray) -> np.ndarray:
+    """mss отдает BGRA - для HSV нужны три канала"""
+    return image[:, :, :3] if image.ndim == 3 and image.shape[2] == 4 else image
+
+
+def _overlap(a: Region, b: Region) -> float:
+    """Доля площади a, занятая b"""
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    if x1 <= x0 or y1 <= y0:
+        return 0.0
+    return (x1 - x0) * (y1 - y0) / float(a[2] * a[3])
+
+
+class RegionLocator:
+    """Поиск игрового стола как крупной однотонной области (сукна).
+
+    Поиск идет по уменьшенному в 1/scale раз снимку: берутся
+    преобладающие насыщенные оттенки, для каждого - наибольшая связная
+    область, почти заполняющая свой ограничивающий прямоугольник. Затем
+    границы уточняются в полном разрешении в узкой полосе вокруг найденного
+    прямоугольника.
+    """
+
+    def __init__(self, scale: float = 0.25, min_area: float = 0.05, min_side: float = 0.15,
+                 hue_tolerance: int = 8, min_fill: float = 0.6, valid_fraction: float = 0.35):
+        self.scale = scale
+        self.min_area = min_area
+        # Доля ширины/высоты экрана - отсекает панели задач и заголовки окон
+        self.min_side = min_side
+        self.hue_tolerance = hue_tolerance
+        self.min_fill = min_fill
+        self.valid_fraction = valid_fraction
+
+    def felt_mask(self, image: np.ndarray, hue: int) -> np.ndarray:
+        """Пиксели цвета сукна (оттенок по кругу, достаточные насыщенность и яркость)"""
+        hsv = cv2.cvtColor(_bgr(image), cv2.COLOR_BGR2HSV)
+        diff = np.abs(hsv[:, :, 0].astype(np.int16) - hue)
+        diff = np.minimum(diff, 180 - diff)
+        mask = (diff <= self.hue_tolerance) & (hsv[:, :, 1] > 60) & (hsv[:, :, 2] > 40)
+        return mask.astype(np.uint8) * 255
+
+    def _dominant_hues(self, hsv: np.ndarray, count: int = 3) -> List[int]:
+        saturated = (hsv[:, :, 1] > 60) & (hsv[:, :, 2] > 40)
+        hues = hsv[:, :, 0][saturated]
+        if hues.size == 0:
+            return []
+        histogram = np.bincount(hues // 10, minlength=18)
+        bins = [b for b in np.argsort(histogram)[::-1][:count] if histogram[b] > 0]
+        return [int(b * 10 + 5) for b in bins]
+
+    @staticmethod
+    def _largest_blob(mask: np.ndarray) -> Optional[Tuple[Region, float]]:
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return None
+        contour = max(contours, key=cv2.contourArea)
+        x, y, w, h = cv2.boundingRect(contour)
+        if w == 0 or h == 0:
+            return None
+        return (x, y, w, h), cv2.contourArea(contour) / float(w * h)
+
+    def candidates(self, screen: np.ndarray) -> List[Tuple[Region, int]]:
+        """Области-кандидаты (в координатах уменьшенного снимка) с оттенком сукна, крупные первыми"""
+        small = cv2.resize(_bgr(screen), None, fx=self.scale, fy=self.scale,
+                           interpolation=cv2.INTER_AREA)
+        hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+        kernel = np.ones((5, 5), np.uint8)
+        height, width = small.shape[:2]
+        min_area = self.min_area * width * height
+
+        found = []
+        for hue in self._dominant_hues(hsv):
+            mask = cv2.morphologyEx(self.felt_mask(small, hue), cv2.MORPH_CLOSE, kernel)
+            blob = self._largest_blob(mask)
+            if blob is None:
+                continue
+            rect, fill = blob
+            if (rect[2] * rect[3] >= min_area and fill >= self.min_fill
+                    and rect[2] >= self.min_side * width and rect[3] >= self.min_side * height):
+                found.append((rect, hue))
+        found.sort(key=lambda item: item[0][2] * item[0][3], reverse=True)
+        return found
+
+    def refine(self, screen: np.ndarray, rect: Region, hue: int) -> Region:
+        """Точные границы в полном разрешении вокруг прямоугольника с уменьшенного снимка"""
+        margin = int(round(2 / self.scale))
+        height, width = screen.shape[:2]
+        x0 = max(0, int(rect[0] / self.scale) - margin)
+        y0 = max(0, int(rect[1] / self.scale) - margin)
+        x1 = min(width, int((rect[0] + rect[2]) / self.scale) + margin)
+        y1 = min(height, int((rect[1] + rect[3]) / self.scale) + margin)
+
+        roi = screen[y0:y1, x0:x1]
+        mask = cv2.morphologyEx(self.felt_mask(roi, hue), cv2.MORPH_CLOSE,
+                                np.ones((9, 9), np.uint8))
+        blob = self._largest_blob(mask)
+        if blob is None:
+            return x0, y0, x1 - x0, y1 - y0
+        x, y, w, h = blob[0]
+        return x0 + x, y0 + y, w, h
+
+    def locate(self, screen: np.ndarray,
+               exclude: Sequence[Region] = ()) -> Optional[Tuple[Region, int]]:
+        """Область игры на полном снимке и оттенок ее сукна; exclude - уже занятые столы"""
+        with metrics.timer("region.locate"):
+            for rect, hue in self.candidates(screen):
+                region = self.refine(screen, rect, hue)
+                if all(_overlap(region, other) < 0.5 for other in exclude):
+                    return region, hue
+        return None
+
+    def validate(self, image: np.ndarray, hue: int) -> bool:
+        """Быстрая проверка сохраненной области: сукно все еще занимает заметную ее часть"""
+        with metrics.timer("region.validate"):
+            height, width = image.shape[:2]
+            if height == 0 or width == 0:
+                return False
+            # Прореживание до ~64 точек по ширине вместо полного кадра
+            step = max(1, width // 64)
+            small = np.ascontiguousarray(_bgr(image)[::step, ::step])
+            felt = np.count_nonzero(self.felt_mask(small, hue))
+            return felt / float(small.shape[0] * small.shape[1]) >= self.valid_fraction
+
+    def band_splits(self, image: np.ndarray, hue: int) -> Dict:
+        """Границы полос поля и сторона колоды по расположению карт.
+
+        Карты - все, что не сукно: крупные пятна сверху относятся к
+        противнику, снизу - к руке, у боковых краев посередине - к колоде.
+        Полосы руки и противника на всю ширину и только расширяются
+        относительно DEFAULT_SPLITS, чтобы вместить найденные карты: карты
+        на поле сдвигаются, и рамка по ним на одном кадре обрезала бы
+        следующие.
+        """
+        height, width = image.shape[:2]
+        not_felt = cv2.bitwise_not(self.felt_mask(image, hue))
+        not_felt = cv2.morphologyEx(not_felt, cv2.MORPH_OPEN, np.ones((5, 5), np.uint8))
+        count, _, stats, _ = cv2.connectedComponentsWithStats(not_felt)
+
+        splits = dict(DEFAULT_SPLITS)
+        min_area = 0.002 * width * height
+        deck_x = []
+        for x, y, w, h, area in stats[1:count]:
+            if area < min_area or w * h > 0.5 * width * height:
+                continue
+            cx, cy = (x + w / 2) / width, (y + h / 2) / height
+            if cy < 1 / 3:
+                # Нижний край карт противника с запасом, но не ниже середины поля
+                splits["top"] = max(splits["top"], min(0.45, (y + h) / height + 0.05))
+            elif cy > 2 / 3:
+                splits["bottom"] = min(splits["bottom"], max(0.55, y / height - 0.05))
+            elif cx < 0.2 or cx > 0.8:
+                deck_x.append(cx)
+        if deck_x:
+            splits["deck_side"] = "left" if sum(deck_x) / len(deck_x) < 0.5 else "right"
+        splits["top"] = round(float(splits["top"]), 4)
+        splits["bottom"] = round(float(splits["bottom"]), 4)
+        return splits
+
+
+class RegionStore:
+    """Найденные области игры в ai_data/regions.json по ключу приложения (LearningEngine.current_app)"""
+
+    def __init__(self, save_dir: str):
+        self.path = os.path.join(save_dir, REGIONS_FILE)
+        self._entries: Optional[Dict[str, Dict]] = None
+
+    @property
+    def entries(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def get(self, app: str) -> Optional[Dict]:
+        return self.entries.get(app)
+
+    def put(self, app: str, entry: Dict):
+        self.entries[app] = entry
+        self._write()
+
+    def remove(self, app: str):
+        if self.entries.pop(app, None) is not None:
+            self._write()
+
+    def _write(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,114 @@
+"""Адаптивная частота анализа: чаще при изменениях на столе и в свой ход, реже в простое."""
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+
+class AdaptiveScheduler:
+    """Выбирает паузу перед следующим захватом кадра.
+
+    - изменение кадра или наш ход -> min_interval на hold секунд;
+    - стол без изменений -> пауза растет в backoff раз до max_interval;
+    - суммарное время стадий анализа не превышает cpu_budget от времени
+      работы (доля одного ядра), иначе пауза увеличивается.
+    """
+
+    def __init__(self, min_interval: float = 0.05, max_interval: float = 1.0,
+                 backoff: float = 1.5, hold: float = 1.5, cpu_budget: float = 0.5,
+                 change_threshold: float = 2.0, window: float = 5.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.hold = hold
+        self.cpu_budget = cpu_budget
+        self.change_threshold = change_threshold
+        self.window = window
+
+        self.interval = min_interval
+        self._active_until = 0.0
+        self._signature: Optional[np.ndarray] = None
+        self._pending_change: Optional[float] = None
+        self._frame_work = 0.0  # время стадий, набранное текущим кадром
+        self._work_per_frame = 0.0  # скользящее среднее
+        self._frames = deque()
+        self._latencies = deque(maxlen=50)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _frame_signature(frame: np.ndarray) -> np.ndarray:
+        # 64x36 в оттенках серого достаточно, чтобы заметить движение карт
+        small = cv2.resize(frame, (64, 36), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGRA2GRAY if small.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+        return small.astype(np.int16)
+
+    def observe_frame(self, frame: np.ndarray) -> bool:
+        """Учет нового кадра, возвращает True, если стол изменился"""
+        signature = self._frame_signature(frame)
+        now = time.monotonic()
+        with self._lock:
+            changed = (
+                self._signature is None
+                or float(np.abs(signature - self._signature).mean()) > self.change_threshold
+            )
+            self._signature = signature
+
+            self._frames.append(now)
+            while self._frames and now - self._frames[0] > self.window:
+                self._frames.popleft()
+
+            if self._frame_work:
+                self._work_per_frame = 0.8 * self._work_per_frame + 0.2 * self._frame_work
+                self._frame_work = 0.0
+
+            if changed:
+                self._active_until = now + self.hold
+                if self._pending_change is None:
+                    self._pending_change = now
+            self._update_interval(now)
+        return changed
+
+    def record_work(self, seconds: float):
+        """Время, потраченное стадией конвейера на кадр"""
+        with self._lock:
+            self._frame_work += seconds
+
+    def record_decision(self, our_turn: bool):
+        """Решение принято; our_turn - ход за нами, нужно реагировать быстро"""
+        now = time.monotonic()
+        with self._lock:
+            if self._pending_change is not None:
+                self._latencies.append(now - self._pending_change)
+                self._pending_change = None
+            if our_turn:
+                self._active_until = max(self._active_until, now + self.hold)
+                self._update_interval(now)
+
+    def _update_interval(self, now: float):
+        if now < self._active_until:
+            interval = self.min_interval
+        else:
+            interval = min(self.interval * self.backoff, self.max_interval)
+        cpu_floor = self._work_per_frame / self.cpu_budget if self.cpu_budget > 0 else 0.0
+        self.interval = max(interval, cpu_floor, self.min_interval)
+
+    def next_interval(self) -> float:
+        with self._lock:
+            return self.interval
+
+    def stats(self) -> Dict[str, float]:
+        """Фактическая частота кадров, текущая пауза и задержка реакции на изменение стола"""
+        with self._lock:
+            frames = len(self._frames)
+            span = self._frames[-1] - self._frames[0] if frames > 1 else 0.0
+            latencies = list(self._latencies)
+            return {
+                "rate": (frames - 1) / span if span > 0 else 0.0,
+                "interval": self.interval,
+                "cpu_load": self._work_per_frame / self.interval if self.interval > 0 else 0.0,
+                "latency_ms": 1000 * sum(latencies) / len(latencies) if latencies else 0.0
+            }
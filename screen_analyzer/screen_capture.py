@@ -1,19 +1,60 @@
 import cv2
 import numpy as np
 import mss
-import pyautogui
-from typing import List, Tuple, Optional, Dict
-from PIL import Image
+import threading
+from typing import List, Tuple, Optional, Dict, Sequence
 from game.durak_game import Card
+from perf.metrics import metrics
+from .region_locator import DEFAULT_SPLITS, Region, RegionLocator, RegionStore, layout_from_splits
+from .card_counter import CardCounter, DigitReader
 
 class ScreenAnalyzer:
-    def __init__(self):
-        self.sct = mss.mss()
-        self.card_templates = self._load_card_templates()
-        self.button_templates = self._load_button_templates()
+    SUIT_NAMES = {"hearts": "♥", "diamonds": "♦", "clubs": "♣", "spades": "♠"}
+    
+    def __init__(self, card_templates: Optional[dict] = None,
+                 button_templates: Optional[dict] = None,
+                 digit_templates: Optional[dict] = None,
+                 deck_counter_box: Optional[Tuple[float, float, float, float]] = None):
+        # mss нельзя использовать из другого потока - у каждого потока свой экземпляр
+        self._local = threading.local()
+        self.card_templates = (
+            card_templates if card_templates is not None else self._load_card_templates()
+        )
+        self.button_templates = (
+            button_templates if button_templates is not None else self._load_button_templates()
+        )
+        self.digit_templates = (
+            digit_templates if digit_templates is not None else self._load_digit_templates()
+        )
         self.game_region = None
         self.card_positions: Dict[str, Tuple[int, int]] = {}  # Кэш позиций карт
+        # Зоны руки/стола/противника/колоды в долях области игры - по границам полос
+        self.splits = dict(DEFAULT_SPLITS)
+        self.layout = layout_from_splits(self.splits)
+        self.locator = RegionLocator()
+        
+        # Счетчики со своими кэшами: у противника и в колоде разные области
+        back = self.card_templates.get('card_back')
+        card_width = back.shape[1] if back is not None else None
+        self.opponent_counter = CardCounter(card_width)
+        self.deck_counter = CardCounter(card_width)
+        # Рамка счетчика колоды (x0, y0, x1, y1) в долях области игры, если игра его показывает.
+        # Без нее число не читается: в зоне колоды есть и ранги на лицевой стороне козыря
+        self.deck_counter_box = deck_counter_box
+        self.deck_reader = DigitReader(self.digit_templates, use_tesseract=deck_counter_box is not None)
         
+    def for_table(self) -> 'ScreenAnalyzer':
+        """Анализатор еще одного стола: свои область и позиции карт, шаблоны общие (только чтение)"""
+        return ScreenAnalyzer(self.card_templates, self.button_templates, self.digit_templates,
+                              self.deck_counter_box)
+    
+    @property
+    def sct(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            sct = self._local.sct = mss.mss()
+        return sct
+    
     def _load_card_templates(self) -> dict:
         # Здесь будет загрузка шаблонов карт
         # В реальном приложении нужно добавить шаблоны всех карт
@@ -22,9 +63,23 @@ class ScreenAnalyzer:
     def _load_button_templates(self) -> dict:
         # Загрузка шаблонов кнопок (Бито, Взять и т.д.)
         return {}
+    
+    def _load_digit_templates(self) -> dict:
+        # Шаблоны цифр счетчика колоды {"0": ..., "9": ...}, если игра его показывает
+        return {}
+        
+    def calibrate_game_region(self, app: Optional[str] = None, store: Optional[RegionStore] = None,
+                              exclude: Sequence[Region] = ()):
+        """Определение области экрана с игрой: автоматически, при неудаче - по курсору"""
+        if self.locate_game_region(app, store, exclude):
+            return
+        self.calibrate_game_region_manually()
+    
+    def calibrate_game_region_manually(self):
+        """Указание углов игрового поля курсором (ввод в консоли)"""
+        # pyautogui требует дисплей, поэтому импортируется только здесь
+        import pyautogui
         
-    def calibrate_game_region(self):
-        """Определение области экрана с игрой"""
         print("Наведите курсор на верхний левый угол игрового поля и нажмите Enter")
         input()
         top_left = pyautogui.position()
@@ -33,12 +88,82 @@ class ScreenAnalyzer:
         input()
         bottom_right = pyautogui.position()
         
+        self.set_game_region(
+            top_left.x, top_left.y,
+            bottom_right.x - top_left.x, bottom_right.y - top_left.y
+        )
+    
+    def locate_game_region(self, app: Optional[str] = None, store: Optional[RegionStore] = None,
+                           exclude: Sequence[Region] = ()) -> bool:
+        """Поиск игрового поля на всем экране.
+
+        Сохраненная для приложения app область только проверяется по
+        снимку самой области; полный поиск - если ее нет или она устарела.
+        exclude - области других столов в координатах экрана.
+        """
+        monitor = self.sct.monitors[0]
+        entry = store.get(app) if store and app else None
+        if entry and self._restore_region(entry, monitor):
+            return True
+        
+        screen = np.array(self.sct.grab(monitor))
+        exclude = [(x - monitor["left"], y - monitor["top"], w, h) for x, y, w, h in exclude]
+        found = self.locator.locate(screen, exclude)
+        if found is None:
+            return False
+        (left, top, width, height), hue = found
+        self.splits = self.locator.band_splits(screen[top:top + height, left:left + width], hue)
+        self.layout = layout_from_splits(self.splits)
+        self.set_game_region(left + monitor["left"], top + monitor["top"], width, height)
+        
+        if store and app:
+            store.put(app, {
+                "region": [self.game_region[k] for k in ("left", "top", "width", "height")],
+                "hue": hue,
+                "splits": self.splits,
+                "screen": [monitor["width"], monitor["height"]]
+            })
+        return True
+    
+    def _restore_region(self, entry: Dict, monitor: Dict) -> bool:
+        if entry.get("screen") != [monitor["width"], monitor["height"]]:
+            return False
+        self.set_game_region(*entry["region"])
+        if not self.locator.validate(self.capture_game_screen(), entry["hue"]):
+            self.game_region = None
+            return False
+        # Записи со старыми рамками зон ("layout") без границ полос - зоны по умолчанию
+        self.splits = dict(DEFAULT_SPLITS)
+        self.splits.update(entry.get("splits", {}))
+        self.layout = layout_from_splits(self.splits)
+        return True
+    
+    def _zone(self, screen: np.ndarray, name: str) -> Tuple[np.ndarray, int, int]:
+        """Часть кадра для зоны layout и ее смещение (x, y) на кадре"""
+        return self._crop(screen, self.layout[name])
+    
+    @staticmethod
+    def _crop(screen: np.ndarray, box: Tuple[float, float, float, float]) -> Tuple[np.ndarray, int, int]:
+        height, width = screen.shape[:2]
+        x0, y0, x1, y1 = box
+        left, top = int(x0 * width), int(y0 * height)
+        return screen[top:int(y1 * height), left:int(x1 * width)], left, top
+    
+    def set_game_region(self, left: int, top: int, width: int, height: int):
+        """Задание области игры без интерактивной калибровки"""
         self.game_region = {
-            "top": top_left.y,
-            "left": top_left.x,
-            "width": bottom_right.x - top_left.x,
-            "height": bottom_right.y - top_left.y
+            "top": top,
+            "left": left,
+            "width": width,
+            "height": height
         }
+    
+    def crop_to_region(self, image: np.ndarray) -> np.ndarray:
+        """Вырезание области игры из полного снимка экрана"""
+        if not self.game_region:
+            return image
+        r = self.game_region
+        return image[r["top"]:r["top"] + r["height"], r["left"]:r["left"] + r["width"]]
         
     def capture_game_screen(self) -> np.ndarray:
         """Захват экрана игры"""
@@ -48,11 +173,51 @@ class ScreenAnalyzer:
         screenshot = self.sct.grab(self.game_region)
         return np.array(screenshot)
     
+    def analyze_frame(self, screen: np.ndarray) -> Dict:
+        """Все распознавания по одному кадру области игры"""
+        with metrics.timer("detect.hand"):
+            detected_cards = self._detect_hand(screen)
+        with metrics.timer("detect.table"):
+            table_cards = self.detect_table_cards(screen)
+        with metrics.timer("detect.opponent"):
+            opponent_cards = self.count_opponent_cards(screen)
+        with metrics.timer("detect.deck"):
+            deck_remaining = self.count_deck_cards(screen)
+        card_targets = {}
+        for card, _, center in detected_cards:
+            card_targets.setdefault(str(card), center)
+        return {
+            "player_cards": [card for card, _, _ in detected_cards],
+            "table_cards": table_cards,
+            "opponent_cards": opponent_cards,
+            "deck_remaining": deck_remaining,
+            # Центры карт руки на этом кадре - цели кликов
+            "card_targets": card_targets
+        }
+    
+    def resolve_click_target(self, action: str, card: Optional[Card], screen: np.ndarray,
+                             detection: Dict) -> Optional[Tuple[int, int]]:
+        """Точка клика для хода по текущему кадру (координаты кадра)"""
+        if action in ("attack", "defend", "add"):
+            if not card:
+                return None
+            return detection["card_targets"].get(str(card))
+        if action == "take":
+            return self.find_take_button(screen)
+        if action == "done":
+            return self.find_done_button(screen)
+        return None
+    
+    def to_screen_coords(self, pos: Tuple[int, int]) -> Tuple[int, int]:
+        """Координаты кадра -> координаты экрана для клика"""
+        if not self.game_region:
+            return pos
+        return pos[0] + self.game_region["left"], pos[1] + self.game_region["top"]
+    
     def detect_table_cards(self, screen: np.ndarray) -> List[Card]:
         """Определение карт на столе"""
-        # Определяем область стола (центральная часть экрана)
-        height, width = screen.shape[:2]
-        table_region = screen[height//4:3*height//4, width//4:3*width//4]
+        # Определяем область стола (по умолчанию центральная часть экрана)
+        table_region, _, _ = self._zone(screen, "table")
         
         detected_cards = []
         gray = cv2.cvtColor(table_region, cv2.COLOR_BGR2GRAY)
@@ -71,9 +236,12 @@ class ScreenAnalyzer:
     
     def detect_cards(self, screen: np.ndarray) -> List[Tuple[Card, Tuple[int, int]]]:
         """Определение карт в руке игрока и их позиций"""
-        # Определяем область руки игрока (нижняя часть экрана)
-        height, width = screen.shape[:2]
-        hand_region = screen[3*height//4:, :]
+        return [(card, pt) for card, pt, _ in self._detect_hand(screen)]
+    
+    def _detect_hand(self, screen: np.ndarray) -> List[Tuple[Card, Tuple[int, int], Tuple[int, int]]]:
+        """Карты руки: карта, левый верхний угол и центр на кадре"""
+        # Определяем область руки игрока (по умолчанию нижняя часть экрана)
+        hand_region, left, top = self._zone(screen, "hand")
         
         detected_cards = []
         gray = cv2.cvtColor(hand_region, cv2.COLOR_BGR2GRAY)
@@ -81,13 +249,15 @@ class ScreenAnalyzer:
         for card_name, template in self.card_templates.items():
             result = cv2.matchTemplate(gray, template, cv2.TM_CCOEFF_NORMED)
             locations = np.where(result >= 0.8)
+            template_h, template_w = template.shape[:2]
             
             for pt in zip(*locations[::-1]):
                 suit, rank = self._parse_card_name(card_name)
                 card = Card(suit, rank)
                 # Преобразуем координаты относительно всего экрана
-                screen_pt = (pt[0], pt[1] + 3*height//4)
-                detected_cards.append((card, screen_pt))
+                screen_pt = (int(pt[0]) + left, int(pt[1]) + top)
+                center = (screen_pt[0] + template_w // 2, screen_pt[1] + template_h // 2)
+                detected_cards.append((card, screen_pt, center))
                 # Сохраняем позицию карты в кэше
                 self.card_positions[str(card)] = screen_pt
         
@@ -95,33 +265,23 @@ class ScreenAnalyzer:
     
     def count_opponent_cards(self, screen: np.ndarray) -> int:
         """Подсчет количества карт у противника"""
-        # Определяем область карт противника (верхняя часть экрана)
-        height = screen.shape[0]
-        opponent_region = screen[:height//4, :]
-        
-        # Используем шаблон рубашки карты для подсчета
-        if 'card_back' in self.card_templates:
-            gray = cv2.cvtColor(opponent_region, cv2.COLOR_BGR2GRAY)
-            result = cv2.matchTemplate(gray, self.card_templates['card_back'], cv2.TM_CCOEFF_NORMED)
-            locations = np.where(result >= 0.8)
-            return len(list(zip(*locations[::-1])))
-        
-        return 0  # Если не удалось определить
+        # Определяем область карт противника (по умолчанию верхняя часть экрана)
+        opponent_region, _, _ = self._zone(screen, "opponent")
+        return self.opponent_counter.count(opponent_region)
     
     def count_deck_cards(self, screen: np.ndarray) -> int:
         """Определение количества карт в колоде"""
-        # Определяем область колоды (правая часть экрана)
-        height, width = screen.shape[:2]
-        deck_region = screen[:, 3*width//4:]
-        
-        # Используем шаблон рубашки карты
-        if 'card_back' in self.card_templates:
-            gray = cv2.cvtColor(deck_region, cv2.COLOR_BGR2GRAY)
-            result = cv2.matchTemplate(gray, self.card_templates['card_back'], cv2.TM_CCOEFF_NORMED)
-            locations = np.where(result >= 0.8)
-            return len(list(zip(*locations[::-1])))
+        # Определяем область колоды (по умолчанию правая часть экрана)
+        deck_region, _, _ = self._zone(screen, "deck")
         
-        return 0  # Если не удалось определить
+        # Точное число - с небольшой рамки счетчика на экране, если она задана
+        if self.deck_counter_box is not None:
+            counter_region, _, _ = self._crop(screen, self.deck_counter_box)
+            remaining = self.deck_reader.read(counter_region)
+            if remaining is not None:
+                return remaining
+        # Иначе видна только стопка: 1, если колода не пуста
+        return min(1, self.deck_counter.count(deck_region))
     
     def find_card_position(self, card: Card) -> Optional[Tuple[int, int]]:
         """Находит позицию конкретной карты на экране"""
@@ -130,36 +290,36 @@ class ScreenAnalyzer:
             return self.card_positions[card_key]
         return None
     
-    def find_take_button(self) -> Optional[Tuple[int, int]]:
-        """Находит кнопку 'Взять'"""
-        if 'take_button' in self.button_templates:
-            screen = self.capture_game_screen()
-            gray = cv2.cvtColor(screen, cv2.COLOR_BGR2GRAY)
-            result = cv2.matchTemplate(gray, self.button_templates['take_button'], cv2.TM_CCOEFF_NORMED)
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-            if max_val >= 0.8:
-                return max_loc
-        return None
+    def find_take_button(self, screen: Optional[np.ndarray] = None) -> Optional[Tuple[int, int]]:
+        """Находит центр кнопки 'Взять' (на переданном кадре или новом снимке)"""
+        with metrics.timer("buttons.take"):
+            return self._find_button('take_button', screen)
     
-    def find_done_button(self) -> Optional[Tuple[int, int]]:
-        """Находит кнопку 'Бито'"""
-        if 'done_button' in self.button_templates:
-            screen = self.capture_game_screen()
+    def find_done_button(self, screen: Optional[np.ndarray] = None) -> Optional[Tuple[int, int]]:
+        """Находит центр кнопки 'Бито' (на переданном кадре или новом снимке)"""
+        with metrics.timer("buttons.done"):
+            return self._find_button('done_button', screen)
+    
+    def _find_button(self, name: str, screen: Optional[np.ndarray]) -> Optional[Tuple[int, int]]:
+        if name in self.button_templates:
+            if screen is None:
+                screen = self.capture_game_screen()
+            template = self.button_templates[name]
             gray = cv2.cvtColor(screen, cv2.COLOR_BGR2GRAY)
-            result = cv2.matchTemplate(gray, self.button_templates['done_button'], cv2.TM_CCOEFF_NORMED)
+            result = cv2.matchTemplate(gray, template, cv2.TM_CCOEFF_NORMED)
             min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
             if max_val >= 0.8:
-                return max_loc
+                template_h, template_w = template.shape[:2]
+                return max_loc[0] + template_w // 2, max_loc[1] + template_h // 2
         return None
     
     def _parse_card_name(self, card_name: str) -> Tuple[str, str]:
         """Парсинг имени карты на масть и ранг"""
         # Пример: "hearts_ace" -> ("♥", "A")
-        suit_map = {"hearts": "♥", "diamonds": "♦", "clubs": "♣", "spades": "♠"}
         rank_map = {
             "ace": "A", "king": "K", "queen": "Q", "jack": "J",
             "10": "10", "9": "9", "8": "8", "7": "7", "6": "6"
         }
         
         suit, rank = card_name.split("_")
-        return suit_map[suit], rank_map[rank] 
\ No newline at end of file
+        return self.SUIT_NAMES[suit], rank_map[rank] 
\ No newline at end of file
@@ -0,0 +1,149 @@
+"""Информация об активном окне: Windows, X11 и статическая заглушка, с кэшем по окну и процессу."""
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, Optional, Tuple
+
+
+class WindowInfoProvider:
+    """Базовый провайдер.
+
+    Наследники реализуют _foreground_window() (дешевый запрос активного
+    окна) и _describe(handle) -> (pid, title). Активное окно кэшируется на
+    focus_ttl, описание окна - на ttl по его handle, имя процесса - по pid,
+    так что частые вызовы get_active_window_info обходятся словарем.
+    """
+
+    def __init__(self, ttl: float = 2.0, focus_ttl: float = 0.25):
+        self.ttl = ttl
+        self.focus_ttl = focus_ttl
+        self._focus: Tuple[float, Optional[int]] = (0.0, None)
+        self._windows: Dict[int, Tuple[float, Dict]] = {}
+        self._process_names: Dict[int, Tuple[float, str]] = {}
+
+    def _foreground_window(self) -> Optional[int]:
+        raise NotImplementedError
+
+    def _describe(self, handle: int) -> Tuple[int, str]:
+        raise NotImplementedError
+
+    def _process_name(self, pid: int) -> str:
+        try:
+            import psutil
+            return psutil.Process(pid).name()
+        except ImportError:
+            with open(f"/proc/{pid}/comm", "r") as f:
+                return f.read().strip()
+
+    def get_active_window_info(self) -> Optional[Dict]:
+        now = time.monotonic()
+        try:
+            checked_at, handle = self._focus
+            if now - checked_at > self.focus_ttl:
+                handle = self._foreground_window()
+                self._focus = (now, handle)
+            if handle is None:
+                return None
+
+            cached = self._windows.get(handle)
+            if cached and now - cached[0] <= self.ttl:
+                return cached[1]
+
+            pid, title = self._describe(handle)
+            name_entry = self._process_names.get(pid)
+            if name_entry and now - name_entry[0] <= self.ttl:
+                name = name_entry[1]
+            else:
+                name = self._process_name(pid)
+                self._process_names[pid] = (now, name)
+
+            info = {'pid': pid, 'name': name, 'title': title}
+            self._windows[handle] = (now, info)
+            if len(self._windows) > 64:
+                self._prune(now)
+            return info
+        except Exception:
+            return None
+
+    def _prune(self, now: float):
+        self._windows = {h: e for h, e in self._windows.items() if now - e[0] <= self.ttl}
+        self._process_names = {p: e for p, e in self._process_names.items() if now - e[0] <= self.ttl}
+
+
+class Win32WindowProvider(WindowInfoProvider):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        import win32gui
+        import win32process
+        self._win32gui = win32gui
+        self._win32process = win32process
+
+    def _foreground_window(self) -> Optional[int]:
+        return self._win32gui.GetForegroundWindow() or None
+
+    def _describe(self, handle: int) -> Tuple[int, str]:
+        _, pid = self._win32process.GetWindowThreadProcessId(handle)
+        return pid, self._win32gui.GetWindowText(handle)
+
+
+class X11WindowProvider(WindowInfoProvider):
+    """Через утилиту xprop (пакет x11-utils), без дополнительных Python-зависимостей"""
+
+    _WINDOW_ID = re.compile(r"window id # (0x[0-9a-fA-F]+)")
+
+    def _xprop(self, *args) -> str:
+        return subprocess.run(
+            ["xprop", *args], capture_output=True, text=True, timeout=1.0, check=True
+        ).stdout
+
+    def _foreground_window(self) -> Optional[int]:
+        match = self._WINDOW_ID.search(self._xprop("-root", "_NET_ACTIVE_WINDOW"))
+        if not match:
+            return None
+        handle = int(match.group(1), 16)
+        return handle or None
+
+    def _describe(self, handle: int) -> Tuple[int, str]:
+        output = self._xprop("-id", hex(handle), "_NET_WM_PID", "_NET_WM_NAME")
+        pid_match = re.search(r"_NET_WM_PID\(CARDINAL\) = (\d+)", output)
+        title_match = re.search(r'_NET_WM_NAME\(\w+\) = "(.*)"', output)
+        pid = int(pid_match.group(1)) if pid_match else 0
+        return pid, title_match.group(1) if title_match else ""
+
+    def _process_name(self, pid: int) -> str:
+        if not pid:
+            return ""
+        return super()._process_name(pid)
+
+
+class StaticWindowProvider(WindowInfoProvider):
+    """Фиксированное окно для запуска без дисплея"""
+
+    def __init__(self, title: str = "headless", name: str = "headless", pid: int = 0, **kwargs):
+        super().__init__(**kwargs)
+        self._info = {'pid': pid, 'name': name, 'title': title}
+
+    def get_active_window_info(self) -> Optional[Dict]:
+        return self._info
+
+
+PROVIDERS = {
+    "win32": Win32WindowProvider,
+    "x11": X11WindowProvider,
+    "static": StaticWindowProvider
+}
+
+
+def get_window_provider(kind: Optional[str] = None, **kwargs) -> WindowInfoProvider:
+    """Провайдер для текущей платформы; переменная DURAK_WINDOW_PROVIDER задает его явно"""
+    kind = kind or os.environ.get("DURAK_WINDOW_PROVIDER")
+    if not kind:
+        if sys.platform == "win32":
+            kind = "win32"
+        elif os.environ.get("DISPLAY"):
+            kind = "x11"
+        else:
+            kind = "static"
+    return PROVIDERS[kind](**kwargs)